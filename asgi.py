@@ -0,0 +1,173 @@
+"""ASGI entry point: ``uvicorn asgi:app``.
+
+RSS and images are served here without holding a thread while the client
+downloads them. Everything else (HTML pages, metrics, admin) goes to the
+Flask app in ``main``, run in the thread pool.
+"""
+import asyncio
+import mimetypes
+from pathlib import Path
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from flask import render_template
+from werkzeug.security import safe_join
+
+import main
+from src.asgi import base_url, request_headers, Receive, Scope, Send, \
+    send_response, wsgi_app_to_asgi
+from src.profiling import profiler
+from src.queries import load_feed
+from src.rss_cache import CachedRss
+from src.rss_response import cached_response, iter_page
+from src.storage import session
+
+
+flask_app = wsgi_app_to_asgi(main.app)
+IMAGE_FOLDER = Path(main.app.root_path, 'image')
+
+
+@profiler.profiled('rss')
+def load_rss(feed_name: str, page: int, url_root: str) -> Optional[CachedRss]:
+    """Cached RSS page, rendered and cached first if needed.
+
+    Sampled by the profiler like the RSS view of the Flask app; sending the
+    body happens on the event loop and is not part of the profile.
+    """
+    try:
+        feed = load_feed(session, feed_name)
+        if feed is None:
+            return None
+        entry = main.rss_cache.get(
+            feed_name, url_root, page, feed.last_build_date,
+        )
+        if entry is not None:
+            return entry
+        links = main.rss_links(feed, url_root, page)
+        if links is None:
+            return None
+        url_for_feed_image, chunks = iter_page(feed, url_root, page, links)
+        return main.rss_cache.put(
+            feed.name, url_root, url_for_feed_image, b''.join(chunks),
+            feed.last_build_date, page,
+        )
+    finally:
+        session.remove()
+
+
+def read_image(filename: str) -> Optional[bytes]:
+    path = safe_join(str(IMAGE_FOLDER), filename)
+    if path is None or not Path(path).is_file():
+        return None
+    return Path(path).read_bytes()
+
+
+def render_not_found() -> bytes:
+    with main.app.test_request_context():
+        return render_template('404.html').encode('utf-8')
+
+
+async def not_found(scope: Scope, send: Send):
+    body = await asyncio.get_running_loop().run_in_executor(
+        None, render_not_found,
+    )
+    await send_response(
+        send, 404,
+        [
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Content-Length', str(len(body))),
+        ],
+        body, scope['method'] == 'HEAD',
+    )
+
+
+async def rss(scope: Scope, receive: Receive, send: Send, feed_name: str):
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    try:
+        page = int(query.get('page', ['1'])[0])
+    except ValueError:
+        page = 1
+    headers = request_headers(scope)
+    entry = None
+    if page >= 1:
+        entry = await asyncio.get_running_loop().run_in_executor(
+            None, load_rss, feed_name, page, base_url(scope, headers),
+        )
+    if entry is None:
+        await not_found(scope, send)
+        return
+    status, response_headers, body = cached_response(entry, headers)
+    await send_response(
+        send, status, response_headers, body, scope['method'] == 'HEAD',
+    )
+
+
+async def image(scope: Scope, receive: Receive, send: Send, filename: str):
+    body = await asyncio.get_running_loop().run_in_executor(
+        None, read_image, filename,
+    )
+    if body is None:
+        await not_found(scope, send)
+        return
+    content_type = mimetypes.guess_type(filename)[0]
+    await send_response(
+        send, 200,
+        [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', f'public, max-age={24 * 3600}'),
+        ],
+        body, scope['method'] == 'HEAD',
+    )
+
+
+async def lifespan(receive: Receive, send: Send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+# Prefix, handler and the rule of the same route in the Flask app.
+ROUTES = (
+    ('/rss/', rss, '/rss/<feed_name>'),
+    ('/image/', image, '/image/<filename>'),
+)
+
+
+def match(path: str) -> tuple:
+    for prefix, handler, rule in ROUTES:
+        name = path[len(prefix):]
+        if path.startswith(prefix) and name and '/' not in name:
+            return handler, rule, name
+    return None, None, None
+
+
+async def app(scope: Scope, receive: Receive, send: Send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    method = scope['method']
+    handler, rule, name = match(scope['path'])
+    if handler is None or method not in ('GET', 'HEAD'):
+        await flask_app(scope, receive, send)
+        return
+    started = time.perf_counter()
+    status = []
+
+    async def send_and_record(message: dict):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_record, name)
+    finally:
+        main.request_seconds.observe(
+            time.perf_counter() - started,
+            route=rule, method=method, status=status[0] if status else 500,
+        )
@@ -0,0 +1,72 @@
+"""Run the benchmark suite and write the results as JSON.
+
+    python -m benchmarks [--sizes 10,1000] [--output results.json]
+                         [--baseline previous.json]
+
+With ``--baseline`` every case is compared with the same case of an earlier
+run, and the exit status is 1 when one of them got slower by more than
+``--tolerance``.
+"""
+import argparse
+import json
+import sys
+
+from .suite import REPEAT, run, SIZES, SOURCES
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    before = {
+        (case['case'], case['items']): case['seconds']
+        for case in baseline['results']
+    }
+    slower = []
+    for case in results['results']:
+        seconds = before.get((case['case'], case['items']))
+        if seconds and case['seconds'] > seconds * (1 + tolerance):
+            slower.append(
+                f"{case['case']} of {case['items']} items: "
+                f"{seconds:.4f}s -> {case['seconds']:.4f}s"
+            )
+    return slower
+
+
+def main():
+    arguments = argparse.ArgumentParser(prog='python -m benchmarks')
+    arguments.add_argument(
+        '--sizes', default=','.join(map(str, SIZES)),
+        help='comma separated numbers of items per feed',
+    )
+    arguments.add_argument('--sources', type=int, default=SOURCES)
+    arguments.add_argument('--repeat', type=int, default=REPEAT)
+    arguments.add_argument('--output', help='file for the JSON results')
+    arguments.add_argument('--baseline', help='JSON results to compare with')
+    arguments.add_argument('--tolerance', type=float, default=0.25)
+    args = arguments.parse_args()
+
+    results = run(
+        tuple(int(size) for size in args.sizes.split(',')),
+        args.sources,
+        args.repeat,
+    )
+    for case in results['results']:
+        print(
+            f"{case['case']:>20} {case['items']:>7} items "
+            f"{case['seconds'] * 1000:10.2f} ms",
+            file=sys.stderr,
+        )
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            slower = regressions(results, json.load(file), args.tolerance)
+        for line in slower:
+            print(f'slower: {line}', file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
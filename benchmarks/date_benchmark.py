@@ -0,0 +1,64 @@
+"""Throughput of pubDate parsing.
+
+Run with ``python -m benchmarks.date_benchmark``. The legacy function below
+is the ``strptime`` path dates took before ``parse_date``: the zone name was
+replaced with an offset and the string parsed with ``strptime``. Feeds
+repeat their dates on every fetch, so both the first parse of a date and a
+repeated one are measured.
+"""
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+
+from src.date_normalize import DATE_FORMAT, parse_date
+
+
+DATES = 2000
+REPEAT = 5
+LEGACY_TIME_ZONES = {'EST': '-0500', 'PDT': '-0700', 'PST': '-0800'}
+START = datetime(2021, 1, 1, tzinfo=timezone(timedelta(hours=-5)))
+
+
+def legacy_parse_date(string: str) -> datetime:
+    time_zone = string.rsplit(' ', 1)[-1]
+    if time_zone in LEGACY_TIME_ZONES:
+        string = string.replace(time_zone, LEGACY_TIME_ZONES[time_zone])
+    return datetime.strptime(string, DATE_FORMAT)
+
+
+def make_dates(count: int) -> list[str]:
+    return [
+        (START + timedelta(hours=number)).strftime(DATE_FORMAT[:-2]) + 'EST'
+        for number in range(count)
+    ]
+
+
+def dates_per_second(parse, dates: list[str], clear=None) -> float:
+    best = float('inf')
+    for _ in range(REPEAT):
+        if clear is not None:
+            clear()
+        started = time.perf_counter()
+        for date in dates:
+            parse(date)
+        best = min(best, time.perf_counter() - started)
+    return len(dates) / best
+
+
+def main():
+    logging.disable(logging.WARNING)
+    dates = make_dates(DATES)
+    assert [parse_date(date) for date in dates] == [
+        legacy_parse_date(date) for date in dates
+    ]
+    legacy = dates_per_second(legacy_parse_date, dates)
+    first = dates_per_second(parse_date, dates, parse_date.cache_clear)
+    repeated = dates_per_second(parse_date, dates)
+    print(f'{DATES} dates, best of {REPEAT} runs')
+    print(f'strptime:         {legacy:12,.0f} dates/s')
+    print(f'parse_date:       {first:12,.0f} dates/s')
+    print(f'parse_date again: {repeated:12,.0f} dates/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Memory taken by the episodes of a feed in the two read models.
+
+Run with ``python -m benchmarks.memory_benchmark``. The episodes are
+loaded from an in-memory database once as mapped dataclasses with their
+enclosures in three queries, and once as the slotted
+views of ``queries.load_episodes``. The memory still held once the
+episodes are loaded and the peak while loading them are measured with
+tracemalloc.
+"""
+from datetime import datetime, timedelta
+import gc
+import logging
+import tracemalloc
+from typing import Callable
+
+from sqlalchemy.orm import joinedload, selectinload, Session
+
+from src.migrations import migrate
+from src.queries import load_episodes
+from src.container import Episode, Feed
+from src.storage import create_db_engine, enclosure_table, episodes_table, \
+    feeds_table
+
+
+EPISODES = 20000
+FEED = 'memory'
+
+
+def fill(session: Session, count: int):
+    session.execute(feeds_table.insert(), {'name': FEED, 'title': FEED})
+    session.execute(episodes_table.insert(), [
+        {
+            'id': number,
+            'feed_name': FEED,
+            'title': f'Episode {number}',
+            'link': f'https://podcast.example.com/{number}',
+            'published': datetime(2021, 1, 1) + timedelta(hours=number),
+            'description': f'<p>Episode {number} notes.</p>' * 60,
+            'duration': '1:02:03',
+            'image': 'https://podcast.example.com/cover_3000px.jpg',
+            'author': 'Podcast Author',
+            'key': str(number),
+        } for number in range(1, count + 1)
+    ])
+    session.execute(enclosure_table.insert(), [
+        {
+            'episode_id': number,
+            'length': str(number * 1000),
+            'type': 'audio/mpeg',
+            'url': f'https://podcast.example.com/{number}.mp3',
+        } for number in range(1, count + 1)
+    ])
+    session.commit()
+
+
+def load_feed(session: Session) -> Feed:
+    return session.query(Feed).filter_by(name=FEED).options(
+        selectinload(Feed.sources),
+        selectinload(Feed.episodes).options(joinedload(Episode.enclosure)),
+    ).one()
+
+
+def measure(load: Callable) -> tuple[object, int, int]:
+    """What ``load`` returns, the bytes it still holds and the peak."""
+    gc.collect()
+    tracemalloc.start()
+    loaded = load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded, current, peak
+
+
+def report(name: str, count: int, current: int, peak: int):
+    print(
+        f'{name:<28} {current / 2 ** 20:8.1f} MB held '
+        f'{current / count:8.0f} B/episode '
+        f'{peak / 2 ** 20:8.1f} MB peak'
+    )
+
+
+def main():
+    logging.disable(logging.WARNING)
+    engine = create_db_engine('sqlite://')
+    migrate(engine)
+    with Session(engine) as session:
+        fill(session, EPISODES)
+    print(f'{EPISODES} episodes')
+    with Session(engine) as session:
+        feed, current, peak = measure(
+            lambda: load_feed(session),
+        )
+        assert len(feed.episodes) == EPISODES
+        report('dataclasses (ORM)', EPISODES, current, peak)
+        del feed
+    with Session(engine) as session:
+        episodes, current, peak = measure(
+            lambda: load_episodes(session, FEED, EPISODES),
+        )
+        assert len(episodes) == EPISODES
+        report('views', EPISODES, current, peak)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Per-item cost of the RSS parser on large synthetic feeds.
+
+Run with ``python -m benchmarks.parser_benchmark``. The legacy functions
+below are the item helpers the parser used before channel defaults were
+precomputed: every field was looked up with ``find`` twice and channel
+defaults with absolute XPath queries for every item.
+"""
+import io
+import logging
+import time
+
+from lxml import etree
+
+from src import parser
+from src.parser import namespaces, normalize_timezone
+
+from .synthetic import make_rss
+
+
+ITEMS = 5000
+REPEAT = 5
+
+
+def _legacy_text(item, path):
+    if item.find(path, namespaces) is None:
+        return ''
+    return item.find(path, namespaces).text.strip()
+
+
+def _legacy_parse_episode(item) -> dict:
+    enclosure = dict(item.find('enclosure').attrib)
+    if item.find('link') is None:
+        link = str(*item.xpath('/rss/channel/link/text()'))
+    else:
+        link = item.find('link').text
+    if item.find('itunes:image', namespaces) is not None:
+        image = item.find('itunes:image', namespaces).attrib['href']
+    else:
+        image = (
+            str(*item.xpath('/rss/channel/image/url/text()')) or
+            str(
+                *item.xpath(
+                    '/rss/channel/itunes:image/@href', namespaces=namespaces,
+                )
+            )
+        )
+    author = str(
+        *item.xpath(
+            '/rss/channel/itunes:author/text()', namespaces=namespaces,
+        ),
+    ) or item.find('author').text
+    return {
+        'title': _legacy_text(item, 'title'),
+        'guid': _legacy_text(item, 'guid'),
+        'enclosure': {
+            'length': enclosure.get('length'),
+            'type': enclosure.get('type'),
+            'url': enclosure.get('url'),
+        },
+        'link': link,
+        'published': normalize_timezone(_legacy_text(item, 'pubDate')),
+        'description': _legacy_text(item, 'description'),
+        'duration': _legacy_text(item, 'itunes:duration'),
+        'image': image,
+        'author': author,
+    }
+
+
+def legacy_get_episodes(rss: bytes):
+    for _, item in etree.iterparse(
+            io.BytesIO(rss), events=('end',), tag='item',
+    ):
+        yield _legacy_parse_episode(item)
+        item.clear()
+        previous = item.getprevious()
+        while previous is not None and previous.tag == 'item':
+            item.getparent().remove(previous)
+            previous = item.getprevious()
+
+
+def per_item_seconds(get_episodes, rss: bytes, items: int) -> float:
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        for _ in get_episodes(rss):
+            pass
+        best = min(best, time.perf_counter() - started)
+    return best / items
+
+
+def main():
+    logging.disable(logging.WARNING)
+    rss = make_rss(ITEMS)
+    assert list(parser.get_episodes(rss)) == list(legacy_get_episodes(rss))
+    legacy = per_item_seconds(legacy_get_episodes, rss, ITEMS)
+    current = per_item_seconds(parser.get_episodes, rss, ITEMS)
+    print(f'{ITEMS} items, best of {REPEAT} runs')
+    print(f'legacy:  {legacy * 1e6:8.2f} us/item')
+    print(f'current: {current * 1e6:8.2f} us/item')
+    print(f'speedup: {legacy / current:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Offline benchmarks of the hot paths, from feed download to RSS request.
+
+Every size is a feed of that many synthetic items split over a few
+sources served by a local HTTP server. The cases are:
+
+- ``parse``: ``parser.get_episodes`` over one document of the whole feed;
+- ``new_episodes_list``: parsing with the stored-episode checks against an
+  empty database;
+- ``sync``: the first update cycle of the feed, i.e. fetching, parsing and
+  merging its sources and writing the episodes (run once, as it only
+  happens once per feed);
+- ``create_rss``: rendering the whole feed from the database rows;
+- ``rss_request`` and ``rss_request_cached``: ``GET /rss/<feed>`` through
+  the Flask test client with the RSS cache cold and warm.
+
+The database, config and server live in a temporary directory, so nothing
+outside it is touched.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import platform
+import tempfile
+import threading
+import time
+from typing import Callable
+
+import yaml
+
+from src import parser
+from src.container import Feed
+from src.rss_builder import create_rss
+
+from .synthetic import make_rss
+
+
+SIZES = (10, 100, 1000, 10000, 50000)
+SOURCES = 3
+REPEAT = 3
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    documents: dict[str, bytes] = {}
+
+    def do_GET(self):
+        body = self.documents.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(documents: dict[str, bytes]) -> ThreadingHTTPServer:
+    """Local stand-in for the upstream hosts, on a free port."""
+    handler = type('Handler', (_Handler,), {'documents': documents})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def split(items: int, sources: int) -> list[int]:
+    return [
+        items // sources + (number < items % sources)
+        for number in range(sources)
+    ]
+
+
+def best_of(repeat: int, function: Callable, *args) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def result(case: str, items: int, seconds: float) -> dict:
+    return {
+        'case': case,
+        'items': items,
+        'seconds': seconds,
+        'items_per_second': items / seconds if seconds else None,
+    }
+
+
+def write_config(path: str, port: int, sizes: tuple, sources: int):
+    feeds = {
+        f'bench-{size}': {
+            'title': f'Benchmark {size}',
+            'description': f'{size} synthetic items',
+            'image': 'image.jpg',
+            'max_items': str(size),
+            'sources': [
+                f'http://127.0.0.1:{port}/{size}-{number}.xml'
+                for number in range(sources)
+            ],
+        } for size in sizes
+    }
+    with open(path, 'w') as file:
+        yaml.dump({'feeds': feeds, 'settings': {'timeout': '60'}}, file)
+
+
+def run(
+        sizes: tuple = SIZES,
+        sources: int = SOURCES,
+        repeat: int = REPEAT,
+) -> dict:
+    logging.disable(logging.WARNING)
+    documents = {
+        f'/{size}-{number}.xml': make_rss(items, f'source{number}')
+        for size in sizes
+        for number, items in enumerate(split(size, sources))
+    }
+    server = serve(documents)
+    workdir = tempfile.TemporaryDirectory()
+    cwd = os.getcwd()
+    os.chdir(workdir.name)
+    os.environ['SINGLEFEED_DATABASE_URL'] = (
+        f'sqlite:///{os.path.join(workdir.name, "benchmark.sqlite")}'
+    )
+    write_config('config.yaml', server.server_port, sizes, sources)
+    try:
+        results = _run(sizes, repeat)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        workdir.cleanup()
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sources': sources,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def _run(sizes: tuple, repeat: int) -> list[dict]:
+    # The database is chosen when the storage is imported, so everything
+    # that uses it is imported once the environment points to the
+    # temporary one.
+    from src.config import load_config, max_items
+    from src.fetcher import Fetcher
+    from src.migrations import migrate
+    from src.polling import PollingPolicy
+    from src.queries import load_episodes, load_feed
+    from src.storage import engine, session
+    from src.updater import create_feeds, new_episodes_list, \
+        reconcile_feeds, update_feeds
+
+    import main
+    logging.disable(logging.WARNING)
+
+    feeds, settings = load_config()
+    migrate(engine)
+    client = main.app.test_client()
+    results = []
+    for size in sizes:
+        name = f'bench-{size}'
+        rss = make_rss(size)
+        results.append(result('parse', size, best_of(
+            repeat, lambda: list(parser.get_episodes(rss)),
+        )))
+        feed = Feed(name, '', '', '', '', '')
+        results.append(result('new_episodes_list', size, best_of(
+            repeat, new_episodes_list, feed, rss,
+        )))
+        # Only this feed is configured, so the cycle syncs only its sources.
+        reconcile_feeds(create_feeds({name: feeds[name]}, max_items(settings)))
+        session.remove()
+        results.append(result('sync', size, best_of(
+            1, update_feeds, Fetcher.from_settings(settings), PollingPolicy(),
+        )))
+        feed_row = load_feed(session, name)
+        episodes = load_episodes(session, name, size)
+        results.append(result('create_rss', size, best_of(
+            repeat, create_rss, feed_row, 'http://localhost/image.jpg',
+            episodes,
+        )))
+        session.remove()
+
+        def request():
+            response = client.get(f'/rss/{name}')
+            assert response.status_code == 200, response.status_code
+            response.get_data()
+
+        def cold_request():
+            main.rss_cache.invalidate(name)
+            request()
+
+        results.append(result('rss_request', size, best_of(
+            repeat, cold_request,
+        )))
+        request()
+        results.append(result('rss_request_cached', size, best_of(
+            repeat, request,
+        )))
+    return results
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+
+DATE_FORMAT = '%a, %d %b %Y %H:%M:%S %z'
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def make_item(number: int, source: str = 'podcast') -> str:
+    published = START + timedelta(hours=number)
+    link = (
+        f'<link>https://{source}.example.com/{number}</link>'
+        if number % 2 else ''
+    )
+    return (
+        '<item>'
+        f'<title>{source} episode {number}</title>'
+        f'<guid>https://{source}.example.com/{number}.mp3</guid>'
+        f'<enclosure length="{number * 1000}" type="audio/mpeg" '
+        f'url="https://{source}.example.com/{number}.mp3"/>'
+        f'{link}'
+        f'<pubDate>{published.strftime(DATE_FORMAT)}</pubDate>'
+        f'<description>{escape(f"<p>Description {number}</p>" * 5)}'
+        '</description>'
+        f'<itunes:duration>{number % 60}:{number % 60:02}</itunes:duration>'
+        '</item>'
+    )
+
+
+def make_rss(items: int, source: str = 'podcast') -> bytes:
+    """RSS document with ``items`` episodes, the newest one first."""
+    body = ''.join(
+        make_item(number, source) for number in range(items, 0, -1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" '
+        'xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">'
+        '<channel>'
+        f'<title>{source}</title>'
+        f'<link>https://{source}.example.com</link>'
+        f'<image><url>https://{source}.example.com/cover.jpg</url></image>'
+        f'<itunes:author>{source} author</itunes:author>'
+        f'{body}'
+        '</channel></rss>'
+    ).encode('utf-8')
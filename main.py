@@ -1,175 +1,360 @@
+from datetime import datetime, timedelta
+from functools import wraps
+import hmac
 import logging
-import yaml
-import requests
-import sys
-from datetime import datetime
-
-from apscheduler.schedulers.background import BackgroundScheduler
-from flask import Flask, Response, abort, render_template, request, \
-    send_from_directory, url_for
-from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import Session
-
-from src import parser
-from src.container import Enclosure, Episode, Feed, Source
-from src.date_normalize import string_to_datetime
-from src.rss_builder import create_rss
-from src.storage import engine
-
-
-default_settings = {'timeout': '60'}
+import os
+import time
+from typing import Optional
+
+from flask import Flask, Response, abort, g, jsonify, make_response, \
+    redirect, render_template, request, send_from_directory, \
+    stream_with_context, url_for
+from werkzeug.http import is_resource_modified
+
+from src.config import load_config
+from src.metrics import CONTENT_TYPE, registry
+from src.migrations import migrate
+from src.profiling import profiler
+from src.queries import count_episodes, last_page, \
+    load_episodes, load_feed, load_feeds
+from src.rss_cache import RssCache
+from src.rss_response import cached_response, iter_page
+from src.search import ORDERS, search_episodes, SearchHit, terms
+from src.storage import engine, session
+from src.thumbnails import is_remote, MAX_AGE, ThumbnailCache
+
+
+max_page_size = 500
 logging.basicConfig(
     level=logging.INFO,
     format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s',
 )
 logger = logging.getLogger(__name__)
-session = Session(engine)
-
-
-def get_config() -> dict:
-    try:
-        with open('config.yaml') as s:
-            return yaml.load(s, Loader=yaml.BaseLoader)
-    except FileNotFoundError as e:
-        logger.error(e)
-        sys.exit()
-
-
-def create_feeds(feeds: dict) -> list[Feed]:
-    feeds_list = []
-    for name, feed_data in feeds.items():
-        feed = Feed(
-            name=name,
-            title=feed_data.get('title'),
-            link=feed_data.get('link'),
-            language=feed_data.get('language'),
-            description=feed_data.get('description'),
-            image=feed_data.get('image'),
-            sources=[Source(url) for url in feed_data.get('sources')],
-        )
-        if feed_data:
-            logger.info(f'"{feed.name}" feed_data created.')
-        else:
-            logger.error(f"Can't to create {name} feed_data")
-        feeds_list.append(feed)
-    return feeds_list
-
-
-def sort_episodes(feed: Feed):
-    if feed.last_build_date:
-        feed.episodes.sort(
-            key=lambda episode: string_to_datetime(episode.published),
-            reverse=True,
-        )
-
-
-def new_episodes_list(feed: Feed, rss_: str) -> list[Episode]:
-    episodes = (
-        Episode(
-            title=episode['title'],
-            enclosure=Enclosure(**episode['enclosure']),
-            link=episode['link'],
-            published=string_to_datetime(episode['published']),
-            description=episode['description'],
-            duration=episode['duration'],
-            image=episode['image'],
-            author=episode['author'],
-        ) for episode in parser.get_episodes(rss_)
+rss_cache = RssCache()
+request_seconds = registry.histogram(
+    'singlefeed_request_seconds',
+    'Time to handle requests, streaming the body included.',
+    ('route', 'method', 'status'),
+)
+for stat in ('hits', 'misses', 'evictions', 'stale'):
+    registry.counter(
+        f'singlefeed_rss_cache_{stat}_total', f'RSS cache {stat}.',
+        function=lambda stat=stat: rss_cache.stats()[stat],
     )
-    return [
-        episode for episode in episodes if (episode.title, episode.link) not in
-        [(e.title, e.link) for e in feed.episodes]
-    ]
+registry.gauge(
+    'singlefeed_rss_cache_bytes', 'Size of the cached RSS documents.',
+    function=lambda: rss_cache.stats()['size'],
+)
 
 
-def check_update(feed: Feed):
-    new_episodes = []
-    logger.info(f'"{feed.name}" check updates...')
-    for source in feed.sources:
-        rss_str = requests.get(source.url).text
-        new_episodes.extend(new_episodes_list(feed, rss_str))
-    if new_episodes:
-        feed.episodes.extend(new_episodes)
-        feed.last_build_date = datetime.now().astimezone()
-        logger.info(f'"{feed.name}" {len(new_episodes)} new episodes added.')
-    else:
-        logger.info(f'"{feed.name}" feed is up to date.')
+def rss_page_url(base_url: str, feed_name: str, page: int) -> str:
+    return f'{base_url}rss/{feed_name}?page={page}'
 
 
-def update_feeds():
-    for feed in session.query(Feed).all():
-        check_update(feed)
-        session.commit()
+def rss_links(feed, base_url: str, page: int) -> Optional[dict]:
+    """Links of a paged feed (RFC 5005), None if there is no such page."""
+    last = last_page(count_episodes(session, feed.name), feed.max_items)
+    if page > last:
+        return None
+    links = {
+        'self': rss_page_url(base_url, feed.name, page),
+        'first': rss_page_url(base_url, feed.name, 1),
+        'last': rss_page_url(base_url, feed.name, last),
+    }
+    if page > 1:
+        links['previous'] = rss_page_url(base_url, feed.name, page - 1)
+    if page < last:
+        links['next'] = rss_page_url(base_url, feed.name, page + 1)
+    return links
 
 
 def init() -> dict:
-    config = get_config()
-    try:
-        feeds = config['feeds']
-        logger.info('"config.yaml" loaded.')
-    except KeyError as e:
-        logger.error(f'"config.yaml" is incorrect. Fill block {e} correctly.')
-        sys.exit()
-    settings = config.setdefault('settings', default_settings)
-    feeds = create_feeds(feeds)
-    for feed in feeds:
-        session.add(feed)
-    session.commit()
+    _, settings = load_config()
+    if 'rss_cache_size' in settings:
+        rss_cache.max_bytes = int(settings['rss_cache_size']) * 2 ** 20
+    migrate(engine)
     return settings
 
 
 def main():
-    settings = init()
-    update_feeds()
-    scheduler = BackgroundScheduler()
-    scheduler.start()
-    scheduler.add_job(
-        update_feeds, trigger="interval", seconds=int(settings['timeout'])
-    )
+    init()
     return Flask(__name__)
 
 
 app = main()
+thumbnails = ThumbnailCache.from_env(os.path.join(app.root_path, 'image'))
 
 
-def load_feed_from_db(feed_name: str) -> Feed:
-    try:
-        return session.query(Feed).filter_by(name=feed_name).one()
-    except TypeError as e:
-        logger.error(e)
+@app.teardown_appcontext
+def remove_session(exception=None):
+    session.remove()
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response: Response) -> Response:
+    started = g.get('started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, response.status_code
+    response.call_on_close(
+        lambda: request_seconds.observe(
+            time.perf_counter() - started,
+            route=route, method=method, status=status,
+        )
+    )
+    return response
+
+
+def profiled_view(name: str):
+    """Profile a sample of requests until their body has been sent."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            run = profiler.start(name)
+            if run is None:
+                return view(*args, **kwargs)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                run.stop()
+                raise
+            response.call_on_close(run.stop)
+            return response
+        return wrapper
+    return decorator
+
+
+def check_admin_token():
+    """Admin routes exist only when SINGLEFEED_ADMIN_TOKEN is set."""
+    token = os.environ.get('SINGLEFEED_ADMIN_TOKEN')
+    if not token:
         abort(404)
+    if not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {token}',
+    ):
+        abort(403)
+
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_settings():
+    check_admin_token()
+    if request.method == 'POST':
+        rate = request.values.get('rate', type=float)
+        if rate is None or not 0 <= rate <= 1:
+            abort(400)
+        profiler.rate = rate
+        logger.info(f'Profiling rate set to {rate}.')
+    return jsonify(profiler.settings())
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def load_feed_from_db(feed_name: str):
+    feed = load_feed(session, feed_name)
+    if feed is None:
+        abort(404)
+    return feed
 
 
 @app.route('/')
 def index():
-    feeds = session.query(Feed).all()
-    return render_template('index.html', feeds=feeds)
+    return render_template('index.html', feeds=load_feeds(session))
+
+
+def page_args(default_limit: int) -> tuple[int, int]:
+    page = request.args.get('page', 1, type=int)
+    limit = request.args.get('limit', default_limit, type=int)
+    if page < 1 or limit < 1:
+        abort(404)
+    return page, min(limit, max_page_size)
 
 
 @app.route('/<feed_name>')
 def feed_page(feed_name):
+    feed = load_feed_from_db(feed_name)
+    page, limit = page_args(feed.max_items)
+    last = last_page(count_episodes(session, feed_name), limit)
+    if page > last:
+        abort(404)
+    episodes = load_episodes(session, feed_name, limit, (page - 1) * limit)
+    return render_template(
+        'feed_page.html', feed=feed, episodes=episodes, page=page,
+        last_page=last, limit=limit,
+    )
+
+
+def date_arg(name: str, end: bool = False) -> Optional[datetime]:
+    """Date or datetime of an ISO 8601 argument.
+
+    An ``end`` date without time covers the whole day.
+    """
+    value = request.args.get(name)
+    if not value:
+        return None
     try:
-        feed = load_feed_from_db(feed_name)
-        return render_template('feed_page.html', feed=feed)
-    except NoResultFound:
+        date = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400)
+    if end and len(value) == 10:
+        date += timedelta(days=1)
+    return date.replace(tzinfo=None)
+
+
+def search_args() -> tuple[str, dict, int, int]:
+    order = request.args.get('order', ORDERS[0])
+    if order not in ORDERS:
+        abort(400)
+    filters = {
+        'feed_name': request.args.get('feed') or None,
+        'since': date_arg('since'),
+        'until': date_arg('until', end=True),
+        'order': order,
+    }
+    page, limit = page_args(20)
+    return request.args.get('q', ''), filters, page, limit
+
+
+def find_episodes(
+        query: str, filters: dict, page: int, limit: int,
+) -> tuple[list[SearchHit], bool]:
+    """One page of search results and whether there is a next one."""
+    hits = search_episodes(
+        session, query, **filters, limit=limit + 1, offset=(page - 1) * limit,
+    )
+    return hits[:limit], len(hits) > limit
+
+
+@app.route('/search')
+def search():
+    query, filters, page, limit = search_args()
+    hits, has_next = find_episodes(query, filters, page, limit)
+    return render_template(
+        'search.html', query=query, filters=filters, hits=hits, page=page,
+        has_next=has_next, feeds=load_feeds(session),
+        page_url=lambda number: url_for(
+            'search', **{**request.args.to_dict(), 'page': number},
+        ),
+    )
+
+
+@app.route('/api/search')
+def search_api():
+    query, filters, page, limit = search_args()
+    if not terms(query):
+        abort(400)
+    hits, has_next = find_episodes(query, filters, page, limit)
+    return jsonify({
+        'query': query,
+        'page': page,
+        'limit': limit,
+        'next_page': page + 1 if has_next else None,
+        'results': [
+            {
+                'feed': hit.feed_name,
+                **hit.episode.as_dict(),
+                'enclosure': hit.episode.enclosure.as_dict(),
+                'published': hit.episode.published and
+                hit.episode.published.isoformat(),
+            } for hit in hits
+        ],
+    })
+
+
+def stream_rss(feed, page: int) -> Response:
+    """Serialize a page that is not cached yet straight from the database.
+
+    The streamed document is put into the cache on the way.
+    """
+    links = rss_links(feed, request.url_root, page)
+    if links is None:
         abort(404)
+    # make_conditional would read the whole stream to set Content-Length,
+    # so the validators are checked before anything is rendered.
+    if not is_resource_modified(
+            request.environ, last_modified=feed.last_build_date,
+    ):
+        response = Response(status=304)
+        response.last_modified = feed.last_build_date
+        return response
+    url_for_feed_image, chunks = iter_page(
+        feed, request.url_root, page, links,
+    )
+    chunks = rss_cache.tee(
+        feed.name, request.url_root, url_for_feed_image, chunks,
+        feed.last_build_date, page,
+    )
+    response = Response(stream_with_context(chunks), mimetype='text/xml')
+    response.last_modified = feed.last_build_date
+    return response
 
 
 @app.route('/rss/<feed_name>')
+@profiled_view('rss')
 def rss(feed_name):
+    page = request.args.get('page', 1, type=int)
+    if page < 1:
+        abort(404)
     feed = load_feed_from_db(feed_name)
-    url_for_feed_image: str = ''.join(
-            (
-                request.url_root[:-1],
-                url_for('image_folder', filename=feed.image),
-            ),
-        )
-    return Response(create_rss(feed, url_for_feed_image), mimetype='text/xml')
+    entry = rss_cache.get(
+        feed_name, request.url_root, page, feed.last_build_date,
+    )
+    if entry is None:
+        return stream_rss(feed, page)
+    status, headers, body = cached_response(entry, request.headers)
+    return Response(body, status, headers)
 
 
 @app.route('/image/<filename>')
 def image_folder(filename):
-    return send_from_directory('image', filename)
+    response = send_from_directory('image', filename)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 3600
+    return response
+
+
+@app.template_global()
+def thumbnail_url(source: str, size: int) -> str:
+    """URL of a thumbnail of an image URL or a file of the image folder."""
+    if not source:
+        return ''
+    if not thumbnails.enabled:
+        return source if is_remote(source) \
+            else url_for('image_folder', filename=source)
+    return url_for(
+        'thumbnail', size=size, src=source,
+        sig=thumbnails.sign(source, size),
+    )
+
+
+@app.route('/thumbnail/<int:size>')
+def thumbnail(size):
+    source = request.args.get('src', '')
+    if not thumbnails.enabled or not thumbnails.verify(
+            source, size, request.args.get('sig', ''),
+    ):
+        abort(404)
+    result = thumbnails.get(source, size)
+    if result is None:
+        # The page shows the original image instead.
+        if is_remote(source):
+            return redirect(source)
+        return redirect(url_for('image_folder', filename=source))
+    path, etag = result
+    response = Response(path.read_bytes(), mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MAX_AGE
+    return response.make_conditional(request)
 
 
 @app.errorhandler(404)
@@ -1,3 +1,11 @@
 #!/bin/bash
 
+if [ "$1" = "worker" ]; then
+    exec python worker.py
+fi
+
+if [ "$1" = "asgi" ]; then
+    exec uvicorn --host=0.0.0.0 --port=8000 asgi:app
+fi
+
 exec gunicorn --bind=0.0.0.0 --preload main:app
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Helpers of the ASGI entry point.
+
+ASGI servers wait for the client to read before ``send`` returns, so a slow
+reader only holds up its own coroutine. Blocking work (the database, the
+renderer, the WSGI app) runs in the default thread pool of the loop.
+"""
+import asyncio
+from datetime import datetime
+import io
+from typing import Awaitable, Callable, Iterable, Optional
+from urllib.parse import unquote
+
+from werkzeug.http import parse_date
+
+
+CHUNK_SIZE = 64 * 1024
+Scope = dict
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+def request_headers(scope: Scope) -> dict[str, str]:
+    return {
+        name.decode('latin-1').lower(): value.decode('latin-1')
+        for name, value in scope['headers']
+    }
+
+
+def base_url(scope: Scope, headers: dict[str, str]) -> str:
+    """Root URL of the app, like ``request.url_root`` in Flask."""
+    host = headers.get('host')
+    if host is None:
+        server_host, port = scope.get('server') or ('localhost', 80)
+        host = f'{server_host}:{port}'
+    scheme, root_path = scope.get('scheme', 'http'), scope.get('root_path', '')
+    return f'{scheme}://{host}{root_path}/'
+
+
+def is_not_modified(
+        headers: dict[str, str],
+        etag: Optional[str],
+        last_modified: Optional[datetime],
+) -> bool:
+    """Whether the conditional headers match, as in RFC 7232 section 6."""
+    if 'if-none-match' in headers:
+        tags = {
+            tag.strip().removeprefix('W/')
+            for tag in headers['if-none-match'].split(',')
+        }
+        return etag is not None and ('*' in tags or f'"{etag}"' in tags)
+    since = parse_date(headers.get('if-modified-since'))
+    if since is None or last_modified is None:
+        return False
+    if last_modified.tzinfo is None or since.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=None)
+        since = since.replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+async def send_response(
+        send: Send,
+        status: int,
+        headers: Iterable[tuple[str, str]],
+        body: bytes = b'',
+        head: bool = False,
+):
+    """Send the body in chunks, each waiting for the client to take it."""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (name.encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+        ],
+    })
+    if head:
+        body = b''
+    for offset in range(0, len(body), CHUNK_SIZE):
+        await send({
+            'type': 'http.response.body',
+            'body': body[offset:offset + CHUNK_SIZE],
+            'more_body': True,
+        })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def wsgi_environ(scope: Scope, body: bytes) -> dict:
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(
+            (scope.get('raw_path') or scope['path'].encode('utf-8'))
+            .decode('latin-1'),
+            encoding='latin-1',
+        ),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in request_headers(scope).items():
+        key = name.upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        environ[key] = value
+    return environ
+
+
+def call_wsgi(wsgi_app, environ: dict) -> tuple[int, list, bytes]:
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+
+def wsgi_app_to_asgi(wsgi_app):
+    """ASGI app running a WSGI app in the thread pool.
+
+    Meant for small responses like the HTML pages: the response is built
+    as a whole in a thread and then sent in chunks.
+    """
+    async def app(scope: Scope, receive: Receive, send: Send):
+        environ = wsgi_environ(scope, await read_body(receive))
+        status, headers, body = await asyncio.get_running_loop() \
+            .run_in_executor(None, call_wsgi, wsgi_app, environ)
+        await send_response(send, status, headers, body)
+    return app
@@ -0,0 +1,34 @@
+import logging
+import sys
+
+import yaml
+
+
+logger = logging.getLogger(__name__)
+default_settings = {'timeout': '60', 'max_items': '100'}
+
+
+def get_config() -> dict:
+    try:
+        with open('config.yaml') as s:
+            return yaml.load(s, Loader=yaml.BaseLoader)
+    except FileNotFoundError as e:
+        logger.error(e)
+        sys.exit()
+
+
+def load_config() -> tuple[dict, dict]:
+    """Feeds and settings blocks of config.yaml."""
+    config = get_config()
+    try:
+        feeds = config['feeds']
+        logger.info('"config.yaml" loaded.')
+    except KeyError as e:
+        logger.error(f'"config.yaml" is incorrect. Fill block {e} correctly.')
+        sys.exit()
+    settings = config.setdefault('settings', default_settings)
+    return feeds, settings
+
+
+def max_items(settings: dict) -> int:
+    return int(settings.get('max_items', default_settings['max_items']))
@@ -23,6 +23,8 @@ class Episode:
     duration: str
     image: str
     author: str
+    key: str = None
+    source_id: int = None
 
 
 @dataclass
@@ -30,6 +32,14 @@ class Source:
 
     id: int = field(init=False)
     url: str
+    etag: str = None
+    last_modified: str = None
+    content_hash: str = None
+    ttl: int = None
+    published_at: datetime = None
+    publish_interval: int = None
+    error_count: int = 0
+    next_poll_at: datetime = None
 
 
 @dataclass
@@ -41,6 +51,7 @@ class Feed:
     language: str
     description: str
     image: str
+    max_items: int = None
     last_build_date: datetime = None
     sources: list[Source] = field(default_factory=list)
     episodes: list[Episode] = field(default_factory=list)
@@ -1,16 +1,121 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import logging
-from datetime import datetime
+import re
+from typing import Optional
 
 
 logger = logging.getLogger(__name__)
 DATE_FORMAT = '%a, %d %b %Y %H:%M:%S %z'
+MONTHS = {
+    month: number for number, month in enumerate(
+        (
+            'jan', 'feb', 'mar', 'apr', 'may', 'jun',
+            'jul', 'aug', 'sep', 'oct', 'nov', 'dec',
+        ),
+        start=1,
+    )
+}
+# Offsets in minutes of the zone names met in feeds. RFC 822 defines the
+# North American ones, the rest are common in the wild.
+TIME_ZONES = {
+    'UT': 0, 'UTC': 0, 'GMT': 0, 'Z': 0, 'WET': 0,
+    'EST': -5 * 60, 'EDT': -4 * 60,
+    'CST': -6 * 60, 'CDT': -5 * 60,
+    'MST': -7 * 60, 'MDT': -6 * 60,
+    'PST': -8 * 60, 'PDT': -7 * 60,
+    'AKST': -9 * 60, 'AKDT': -8 * 60,
+    'HST': -10 * 60,
+    'AST': -4 * 60, 'ADT': -3 * 60,
+    'NST': -3 * 60 - 30, 'NDT': -2 * 60 - 30,
+    'BST': 60, 'IST': 5 * 60 + 30, 'WEST': 60,
+    'CET': 60, 'CEST': 2 * 60,
+    'EET': 2 * 60, 'EEST': 3 * 60,
+    'MSK': 3 * 60,
+    'HKT': 8 * 60, 'SGT': 8 * 60, 'AWST': 8 * 60,
+    'JST': 9 * 60, 'KST': 9 * 60,
+    'ACST': 9 * 60 + 30, 'ACDT': 10 * 60 + 30,
+    'AEST': 10 * 60, 'AEDT': 11 * 60,
+    'NZST': 12 * 60, 'NZDT': 13 * 60,
+}
+_rfc_822 = re.compile(
+    r'(?:[A-Za-z]+,?\s*)?'
+    r'(?P<day>\d{1,2})\s+(?P<month>[A-Za-z]{3})[A-Za-z]*\.?\s+'
+    r'(?P<year>\d{2}|\d{4})\s+'
+    r'(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?'
+    r'(?:\s*(?P<zone>[+-]\d{2}:?\d{2}|[A-Za-z]+))?'
+)
+_utc_offsets = {0: timezone.utc}
 
 
-def string_to_datetime(string: str) -> datetime:
+def _timezone(minutes: int) -> timezone:
+    if minutes not in _utc_offsets:
+        _utc_offsets[minutes] = timezone(timedelta(minutes=minutes))
+    return _utc_offsets[minutes]
+
+
+def _offset(zone: Optional[str]) -> Optional[int]:
+    """Offset in minutes of a numeric or named zone, 0 when it is missing."""
+    if not zone:
+        return 0
+    if zone[0] in '+-':
+        digits = zone[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:])
+        return -minutes if zone[0] == '-' else minutes
+    return TIME_ZONES.get(zone.upper())
+
+
+def _parse_rfc_822(string: str) -> Optional[datetime]:
+    match = _rfc_822.fullmatch(string)
+    if match is None:
+        return None
+    month = MONTHS.get(match['month'].lower())
+    offset = _offset(match['zone'])
+    if month is None or offset is None:
+        return None
+    year = int(match['year'])
+    if len(match['year']) == 2:
+        year += 2000 if year < 50 else 1900
+    return datetime(
+        year, month, int(match['day']),
+        int(match['hour']), int(match['minute']), int(match['second'] or 0),
+        tzinfo=_timezone(offset),
+    )
+
+
+def _parse_iso_8601(string: str) -> Optional[datetime]:
+    if string.endswith(('Z', 'z')):
+        string = f'{string[:-1]}+00:00'
     try:
-        return datetime.strptime(string, DATE_FORMAT)
-    except ValueError as e:
-        logger.error(e)
+        date = datetime.fromisoformat(string)
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        return date.replace(tzinfo=timezone.utc)
+    return date
+
+
+@lru_cache(maxsize=4096)
+def parse_date(string: str) -> Optional[datetime]:
+    """Date of an RFC 822/2822 or ISO 8601 string, None if it is neither.
+
+    Feeds repeat the same dates on every fetch, so the results are cached.
+    A missing time zone is taken as UTC.
+    """
+    string = string.strip()
+    try:
+        return _parse_rfc_822(string) or _parse_iso_8601(string)
+    except ValueError:
+        return None
+
+
+def string_to_datetime(string: str) -> datetime:
+    date = parse_date(string)
+    if date is None:
+        logger.error(
+            f'time data {string!r} is not an RFC 822 or ISO 8601 date'
+        )
+    return date
 
 
 def datetime_to_string(date: datetime) -> str:
@@ -18,14 +123,17 @@ def datetime_to_string(date: datetime) -> str:
 
 
 def normalize_timezone(date_: str) -> str:
-    time_zones = {
-        'EST': '-0500',
-        'PDT': '-0700',
-        'PST': '-0800',
-    }
-    time_zone = date_.rsplit(' ', 1)[-1]
-    if time_zone in time_zones:
-        normalize_date = date_.replace(time_zone, time_zones[time_zone])
-        logger.info(f'Date {date_} changed to {normalize_date}')
-        return normalize_date
-    return date_
+    """Replace a named zone with its offset.
+
+    ``parse_date`` reads named zones as well; the zero offsets (GMT, UT, Z)
+    are the most common in feeds and are left as they are.
+    """
+    date, _, time_zone = date_.rpartition(' ')
+    offset = TIME_ZONES.get(time_zone.upper())
+    if not date or not offset:
+        return date_
+    sign = '-' if offset < 0 else '+'
+    hours, minutes = divmod(abs(offset), 60)
+    normalize_date = f'{date} {sign}{hours:02}{minutes:02}'
+    logger.info(f'Date {date_} changed to {normalize_date}')
+    return normalize_date
@@ -0,0 +1,193 @@
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import hashlib
+import logging
+import threading
+import time
+from typing import Iterable, Mapping, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from .container import Source
+from .metrics import registry, SIZE_BUCKETS
+
+
+logger = logging.getLogger(__name__)
+fetch_seconds = registry.histogram(
+    'singlefeed_fetch_seconds', 'Time to download a source.', ('source',),
+)
+fetch_bytes = registry.histogram(
+    'singlefeed_fetch_bytes', 'Size of the downloaded documents.',
+    ('source',), buckets=SIZE_BUCKETS,
+)
+fetch_responses = registry.counter(
+    'singlefeed_fetch_responses_total',
+    'Fetches by HTTP status, "error" when there was no response.',
+    ('source', 'status'),
+)
+
+
+@dataclass
+class FetchResult:
+
+    url: str
+    content: Optional[bytes] = None
+    status: Optional[int] = None
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    max_age: Optional[int] = None
+    retry_after: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+def conditional_headers(source: Source) -> dict:
+    headers = {}
+    if source.etag:
+        headers['If-None-Match'] = source.etag
+    if source.last_modified:
+        headers['If-Modified-Since'] = source.last_modified
+    return headers
+
+
+def cache_max_age(headers: Mapping[str, str]) -> Optional[int]:
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name.lower() == 'max-age' and value.strip('"').isdigit():
+            return int(value.strip('"'))
+    return None
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[int]:
+    """Seconds to wait from a ``Retry-After`` in seconds or as a date."""
+    value = headers.get('Retry-After', '').strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0, int((date - datetime.now(timezone.utc)).total_seconds()))
+
+
+class Fetcher:
+    """Download many sources at once.
+
+    At most ``max_connections`` requests run in parallel and at most
+    ``max_connections_per_host`` of them go to the same host. Sources wait
+    for their host in a queue of their own, not in the thread pool, so one
+    slow upstream can only hold up its own sources.
+    """
+
+    def __init__(
+            self,
+            max_connections: int = 10,
+            max_connections_per_host: int = 2,
+            request_timeout: float = 30,
+    ):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.request_timeout = request_timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> 'Fetcher':
+        return cls(
+            max_connections=int(settings.get('max_connections', 10)),
+            max_connections_per_host=int(
+                settings.get('max_connections_per_host', 2)
+            ),
+            request_timeout=float(settings.get('request_timeout', 30)),
+        )
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def fetch(self, source: Source) -> FetchResult:
+        url = source.url
+        started = time.perf_counter()
+        try:
+            response = self._session().get(
+                url,
+                headers=conditional_headers(source),
+                timeout=self.request_timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.error(f'"{url}" fetch failed: {e}')
+            fetch_seconds.observe(
+                time.perf_counter() - started, source=url,
+            )
+            fetch_responses.inc(
+                source=url,
+                status=getattr(e.response, 'status_code', 'error'),
+            )
+            headers = getattr(e.response, 'headers', None) or {}
+            return FetchResult(
+                url, error=str(e), retry_after=retry_after(headers),
+            )
+        fetch_seconds.observe(time.perf_counter() - started, source=url)
+        fetch_responses.inc(source=url, status=response.status_code)
+        result = FetchResult(
+            url,
+            status=response.status_code,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            max_age=cache_max_age(response.headers),
+        )
+        if not result.not_modified:
+            result.content = response.content
+            fetch_bytes.observe(len(response.content), source=url)
+            result.content_hash = hashlib.sha256(response.content).hexdigest()
+        return result
+
+    def fetch_all(self, sources: Iterable[Source]) -> dict[int, FetchResult]:
+        """Fetch every source, taking turns between the hosts."""
+        queues = defaultdict(deque)
+        for source in sources:
+            queues[urlsplit(source.url).hostname].append(source)
+        if not queues:
+            return {}
+        results = {}
+        running = {}
+        busy = Counter()
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            while queues or running:
+                submitted = True
+                while submitted and len(running) < self.max_connections:
+                    submitted = False
+                    for host in list(queues):
+                        if len(running) >= self.max_connections:
+                            break
+                        if busy[host] >= self.max_connections_per_host:
+                            continue
+                        source = queues[host].popleft()
+                        if not queues[host]:
+                            del queues[host]
+                        busy[host] += 1
+                        running[executor.submit(self.fetch, source)] = (
+                            host, source,
+                        )
+                        submitted = True
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    host, source = running.pop(future)
+                    busy[host] -= 1
+                    results[source.id] = future.result()
+        return results
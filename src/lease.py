@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+import logging
+import os
+import socket
+from typing import Union
+import uuid
+
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .storage import leases_table
+
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The lease was taken over by another holder."""
+
+
+class Lease:
+    """Lock held in the database for a limited time.
+
+    Only one holder can have the lease at a time, across processes and
+    hosts sharing the database. The holder keeps it by calling ``acquire``
+    again before ``ttl`` runs out; if it stops doing so, for example because
+    its process died, anybody else can take the lease over. Writes that
+    must only be made by the holder call ``renew`` in their transaction.
+    """
+
+    def __init__(self, engine: Engine, name: str, ttl: timedelta):
+        self.engine = engine
+        self.name = name
+        self.ttl = ttl
+        host = socket.gethostname()
+        self.holder = f'{host}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def acquire(self) -> bool:
+        now = datetime.utcnow()
+        leases = leases_table.c
+        with self.engine.begin() as connection:
+            taken = connection.execute(
+                leases_table.update().where(
+                    and_(
+                        leases.name == self.name,
+                        or_(
+                            leases.holder == self.holder,
+                            leases.expires_at < now,
+                        ),
+                    )
+                ).values(holder=self.holder, expires_at=now + self.ttl)
+            ).rowcount
+        if taken:
+            return True
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    leases_table.insert(),
+                    {
+                        'name': self.name,
+                        'holder': self.holder,
+                        'expires_at': now + self.ttl,
+                    },
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def renew(self, connection: Union[Connection, Session]):
+        """Extend the lease in the transaction of ``connection``.
+
+        Raises LeaseLost when another holder has taken the lease, so the
+        writes of that transaction are rolled back instead of committed.
+        """
+        leases = leases_table.c
+        renewed = connection.execute(
+            leases_table.update().where(
+                and_(leases.name == self.name, leases.holder == self.holder)
+            ).values(expires_at=datetime.utcnow() + self.ttl)
+        ).rowcount
+        if not renewed:
+            raise LeaseLost(
+                f'"{self.name}" lease is not held by {self.holder}.'
+            )
+
+    def release(self):
+        leases = leases_table.c
+        with self.engine.begin() as connection:
+            connection.execute(
+                leases_table.delete().where(
+                    and_(
+                        leases.name == self.name,
+                        leases.holder == self.holder,
+                    )
+                )
+            )
@@ -0,0 +1,365 @@
+"""Fill in missing enclosure sizes and durations by probing the media files.
+
+Many feeds leave out the enclosure ``length`` (or give "0") and the
+``itunes:duration``. The size is read from a HEAD request, the duration
+from the first bytes of the file: the Xing/VBRI header or the bitrate of
+an MP3, the ``mvhd`` box of an MP4 (looked for at the end of the file as
+well). Every URL is probed once and the result is kept in the
+``media_probes`` table, whether it succeeded or not.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import re
+import struct
+import threading
+from typing import Iterable, Optional
+
+import requests
+from sqlalchemy import and_, exists, or_, select
+
+from .lease import Lease
+from .metrics import registry
+from .storage import enclosure_table, episodes_table, feeds_table, \
+    media_probes_table, session
+
+
+logger = logging.getLogger(__name__)
+RANGE_BYTES = 64 * 1024
+probes = registry.counter(
+    'singlefeed_media_probes_total', 'Media files probed, by outcome.',
+    ('outcome',),
+)
+# Bitrates in kbit/s of MPEG audio layer III by bitrate index.
+MPEG1_BITRATES = (
+    0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+)
+MPEG2_BITRATES = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG 1
+    2: (22050, 24000, 16000),  # MPEG 2
+    0: (11025, 12000, 8000),  # MPEG 2.5
+}
+
+
+@dataclass
+class MediaInfo:
+
+    length: Optional[int] = None
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+
+def format_duration(seconds: float) -> str:
+    """Duration in the ``itunes:duration`` form, H:MM:SS or M:SS."""
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02}:{seconds:02}'
+    return f'{minutes}:{seconds:02}'
+
+
+def id3_size(data: bytes) -> int:
+    """Size of the ID3v2 tag the file starts with, 0 if there is none."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = size << 7 | byte & 0x7f
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def mp3_duration(
+        data: bytes, length: Optional[int], offset: int = 0,
+) -> Optional[float]:
+    """Duration of an MP3 from the bytes after its ID3 tag.
+
+    ``offset`` is the position of ``data`` in the file and ``length`` the
+    size of the whole file, needed for files without a Xing or VBRI header.
+    """
+    start = _find_frame(data)
+    if start is None:
+        return None
+    header = struct.unpack('>I', data[start:start + 4])[0]
+    version = header >> 19 & 3
+    bitrate_index = header >> 12 & 0xf
+    sample_rate_index = header >> 10 & 3
+    mono = header >> 6 & 3 == 3
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    samples = 1152 if version == 3 else 576
+    if version == 3:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    xing = start + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 1 and len(data) >= xing + 12:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+            return frames * samples / sample_rate
+    vbri = start + 4 + 32
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        frames = struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+        return frames * samples / sample_rate
+    bitrates = MPEG1_BITRATES if version == 3 else MPEG2_BITRATES
+    bitrate = bitrates[bitrate_index] * 1000
+    if not length or not bitrate:
+        return None
+    return (length - offset - start) * 8 / bitrate
+
+
+def _find_frame(data: bytes) -> Optional[int]:
+    """Offset of the first layer III frame header followed by another one."""
+    for match in re.finditer(rb'\xff[\xe2-\xe3\xf2-\xf3\xfa-\xfb]', data):
+        start = match.start()
+        if len(data) < start + 4:
+            return None
+        header = struct.unpack('>I', data[start:start + 4])[0]
+        version = header >> 19 & 3
+        bitrate_index = header >> 12 & 0xf
+        sample_rate_index = header >> 10 & 3
+        if version == 1 or bitrate_index in (0, 0xf):
+            continue
+        if sample_rate_index == 3:
+            continue
+        bitrates = MPEG1_BITRATES if version == 3 else MPEG2_BITRATES
+        sample_rate = SAMPLE_RATES[version][sample_rate_index]
+        coefficient = 144 if version == 3 else 72
+        size = (
+            coefficient * bitrates[bitrate_index] * 1000 // sample_rate +
+            (header >> 9 & 1)
+        )
+        following = data[start + size:start + size + 2]
+        if len(following) < 2 or (
+                following[0] == 0xff and following[1] & 0xe0 == 0xe0
+        ):
+            return start
+    return None
+
+
+def mp4_duration(data: bytes) -> Optional[float]:
+    """Duration from the ``mvhd`` box, if ``data`` contains it."""
+    position = data.find(b'mvhd')
+    if position < 4:
+        return None
+    box = data[position + 4:]
+    if not box:
+        return None
+    if box[0] == 1 and len(box) >= 32:
+        timescale, duration = struct.unpack('>IQ', box[20:32])
+    elif len(box) >= 20:
+        timescale, duration = struct.unpack('>II', box[12:20])
+    else:
+        return None
+    return duration / timescale if timescale else None
+
+
+def _content_length(response: requests.Response) -> Optional[int]:
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+        return int(content_range.rsplit('/', 1)[1])
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() and response.status_code == 200 \
+        else None
+
+
+class MediaProber:
+    """Probe media files, at most ``max_connections`` at a time."""
+
+    def __init__(
+            self,
+            max_connections: int = 4,
+            request_timeout: float = 10,
+            range_bytes: int = RANGE_BYTES,
+    ):
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.range_bytes = range_bytes
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> 'MediaProber':
+        return cls(
+            max_connections=int(settings.get('media_probe_connections', 4)),
+            request_timeout=float(settings.get('request_timeout', 30)),
+        )
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _range(self, url: str, start: int) -> tuple[bytes, Optional[int]]:
+        """Bytes from ``start`` on, and the size of the file if known."""
+        if start < 0:
+            range_ = f'bytes={start}'
+        else:
+            range_ = f'bytes={start}-{start + self.range_bytes - 1}'
+        with self._session().get(
+                url, headers={'Range': range_}, stream=True,
+                timeout=self.request_timeout,
+        ) as response:
+            response.raise_for_status()
+            if start and response.status_code != 206:
+                return b'', _content_length(response)
+            data = b''
+            for chunk in response.iter_content(self.range_bytes):
+                data += chunk
+                if len(data) >= self.range_bytes:
+                    break
+            return data[:self.range_bytes], _content_length(response)
+
+    def probe(self, url: str) -> MediaInfo:
+        """Size and duration of the file; failures are part of the result."""
+        length = None
+        try:
+            response = self._session().head(
+                url, allow_redirects=True, timeout=self.request_timeout,
+            )
+            response.raise_for_status()
+            length = _content_length(response)
+            data, total = self._range(url, 0)
+            length = length or total
+            duration = mp4_duration(data)
+            if duration is None and data[4:8] == b'ftyp':
+                duration = mp4_duration(self._range(url, -self.range_bytes)[0])
+            if duration is None:
+                offset = id3_size(data)
+                if offset + 4 > len(data):
+                    data, _ = self._range(url, offset)
+                else:
+                    data = data[offset:]
+                duration = mp3_duration(data, length, offset)
+        except requests.RequestException as e:
+            logger.warning(f'"{url}" probe failed: {e}')
+            probes.inc(outcome='error')
+            return MediaInfo(error=str(e))
+        except (struct.error, IndexError, KeyError, ValueError) as e:
+            logger.warning(f'"{url}" media header not readable: {e}')
+            probes.inc(outcome='unreadable')
+            return MediaInfo(length, error=f'Unreadable header: {e}')
+        probes.inc(outcome='ok' if duration else 'no_duration')
+        return MediaInfo(length, duration)
+
+    def probe_all(self, urls: Iterable[str]) -> dict[str, MediaInfo]:
+        urls = list(urls)
+        if not urls:
+            return {}
+        with ThreadPoolExecutor(
+                max_workers=min(self.max_connections, len(urls)),
+        ) as executor:
+            return dict(zip(urls, executor.map(self.probe, urls)))
+
+
+def _missing_length(enclosure):
+    return or_(enclosure.length.is_(None), enclosure.length.in_(('', '0')))
+
+
+def _missing_duration(episodes):
+    return or_(episodes.duration.is_(None), episodes.duration == '')
+
+
+def unprobed_urls(limit: int) -> list[str]:
+    """Enclosure URLs lacking a size or duration that were never probed."""
+    enclosure, episodes = enclosure_table.c, episodes_table.c
+    return session.execute(
+        select(enclosure.url).distinct().select_from(
+            enclosure_table.join(
+                episodes_table, enclosure.episode_id == episodes.id,
+            )
+        ).where(
+            enclosure.url.is_not(None),
+            enclosure.url != '',
+            or_(_missing_length(enclosure), _missing_duration(episodes)),
+            ~exists().where(media_probes_table.c.url == enclosure.url),
+        ).limit(limit)
+    ).scalars().all()
+
+
+def apply_probes() -> set[str]:
+    """Copy probed values into the enclosures and episodes missing them.
+
+    Returns the names of the changed feeds.
+    """
+    enclosure, episodes = enclosure_table.c, episodes_table.c
+    probe = media_probes_table.c
+    length = select(probe.length).where(
+        probe.url == enclosure.url,
+    ).scalar_subquery()
+    duration = select(probe.duration).select_from(
+        enclosure_table.join(media_probes_table, probe.url == enclosure.url)
+    ).where(
+        enclosure.episode_id == episodes.id, probe.duration.is_not(None),
+    ).limit(1).scalar_subquery()
+    feeds = set(session.execute(
+        select(episodes.feed_name).distinct().select_from(
+            episodes_table.join(
+                enclosure_table, enclosure.episode_id == episodes.id,
+            ).join(media_probes_table, probe.url == enclosure.url)
+        ).where(
+            or_(
+                and_(_missing_length(enclosure), probe.length.is_not(None)),
+                and_(
+                    _missing_duration(episodes), probe.duration.is_not(None),
+                ),
+            )
+        )
+    ).scalars())
+    if not feeds:
+        return feeds
+    session.execute(
+        enclosure_table.update().where(
+            _missing_length(enclosure), length.is_not(None),
+        ).values(length=length)
+    )
+    session.execute(
+        episodes_table.update().where(
+            _missing_duration(episodes), duration.is_not(None),
+        ).values(duration=duration)
+    )
+    session.execute(
+        feeds_table.update().where(feeds_table.c.name.in_(feeds)).values(
+            last_build_date=datetime.now().astimezone(),
+        )
+    )
+    return feeds
+
+
+def enrich_enclosures(
+        prober: MediaProber, limit: int = 50, lease: Optional[Lease] = None,
+):
+    """Probe up to ``limit`` new media files and fill in what they tell.
+
+    With a ``lease``, the results are only written while it is held.
+    """
+    try:
+        infos = prober.probe_all(unprobed_urls(limit))
+        if lease is not None:
+            lease.renew(session)
+        if infos:
+            session.execute(
+                media_probes_table.insert(),
+                [
+                    {
+                        'url': url,
+                        'length': str(info.length) if info.length else None,
+                        'duration': (
+                            format_duration(info.duration)
+                            if info.duration else None
+                        ),
+                        'error': info.error,
+                        'probed_at': datetime.utcnow(),
+                    } for url, info in infos.items()
+                ],
+            )
+        feeds = apply_probes()
+        session.commit()
+    finally:
+        session.remove()
+    if infos or feeds:
+        logger.info(
+            f'{len(infos)} media files probed, feeds completed: '
+            f'{", ".join(sorted(feeds)) or "none"}.'
+        )
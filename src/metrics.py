@@ -0,0 +1,201 @@
+"""Counters, gauges and histograms in the Prometheus text format.
+
+Every process keeps its own metrics in ``registry``: the web process serves
+them at ``/metrics``, the worker on its own port (``metrics_port``).
+Recording a value takes a lock and a dictionary update, so the metrics are
+always on.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+
+logger = logging.getLogger(__name__)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)
+SIZE_BUCKETS = tuple(2 ** power for power in range(10, 27, 2))
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return f'{{{",".join(pairs)}}}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+
+    type = 'untyped'
+
+    def __init__(
+            self,
+            name: str,
+            help_: str,
+            labels: tuple = (),
+            function: Optional[Callable[[], float]] = None,
+    ):
+        """``function``, if given, is called for the value on every render."""
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterator[str]:
+        if self.function is not None:
+            yield f'{self.name} {_number(self.function())}'
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+    def render(self) -> str:
+        return '\n'.join((
+            f'# HELP {self.name} {self.help}',
+            f'# TYPE {self.name} {self.type}',
+            *self.samples(),
+        ))
+
+
+class Counter(Metric):
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+
+    type = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            help_: str,
+            labels: tuple = (),
+            buckets: tuple = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0),
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            ]
+        for key, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = _labels(self.labels, key, f'le="{_number(bound)}"')
+                yield f'{self.name}_bucket{le} {cumulative}'
+            labels = _labels(self.labels, key)
+            yield f'{self.name}_sum{labels} {_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_: str, labels: tuple = (), **kwargs):
+        return self.register(Counter(name, help_, labels, **kwargs))
+
+    def gauge(self, name: str, help_: str, labels: tuple = (), **kwargs):
+        return self.register(Gauge(name, help_, labels, **kwargs))
+
+    def histogram(self, name: str, help_: str, labels: tuple = (), **kwargs):
+        return self.register(Histogram(name, help_, labels, **kwargs))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(f'{metric.render()}\n' for metric in metrics)
+
+
+registry = Registry()
+
+
+def serve(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve ``registry`` over HTTP from a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f'Metrics served on port {port}.')
+    return server
@@ -0,0 +1,196 @@
+"""Versioned schema migrations.
+
+A new database is created from ``storage.metadata`` and stamped with the
+latest version. An existing database is brought up to date by running the
+migrations after its version in order. To change the schema, change the
+tables in ``storage`` and append a function doing the same change to an
+existing database to ``MIGRATIONS``.
+"""
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from .config import default_settings
+from .parser import legacy_key
+from .storage import EPISODES_FTS, metadata
+
+
+logger = logging.getLogger(__name__)
+version_metadata = MetaData()
+schema_version_table = Table(
+    'schema_version',
+    version_metadata,
+    Column('version', Integer, nullable=False),
+)
+
+
+def _add_columns(connection: Connection, table: str, columns: list[str]):
+    existing = {
+        column['name'] for column in inspect(connection).get_columns(table)
+    }
+    for column in columns:
+        if column.split()[0] not in existing:
+            connection.execute(
+                text(f'ALTER TABLE {table} ADD COLUMN {column}'),
+            )
+
+
+def _add_episode_keys(connection: Connection):
+    """Add the identity key of the episodes and fill it in.
+
+    The guid of stored episodes is not known, so they get a legacy key,
+    made of the enclosure URL and the link; the updater replaces it with the
+    key of the item when it meets the item again. Episodes that would share
+    a key in a feed get their id added to it.
+    """
+    _add_columns(connection, 'episodes', ["key VARCHAR DEFAULT '' NOT NULL"])
+    rows = connection.execute(text(
+        'SELECT episodes.id, episodes.feed_name, enclosure.url, episodes.link '
+        'FROM episodes LEFT OUTER JOIN enclosure '
+        'ON enclosure.episode_id = episodes.id '
+        "WHERE episodes.key IS NULL OR episodes.key = '' "
+        'ORDER BY episodes.id'
+    )).all()
+    taken = set(connection.execute(text(
+        "SELECT feed_name, key FROM episodes WHERE key != ''"
+    )).all())
+    keys = []
+    for id_, feed_name, url, link in rows:
+        key = legacy_key({'enclosure': {'url': url}, 'link': link})
+        if (feed_name, key) in taken:
+            key = legacy_key(
+                {'enclosure': {'url': url}, 'link': f'{link}|{id_}'},
+            )
+        taken.add((feed_name, key))
+        keys.append({'id': id_, 'key': key})
+    if keys:
+        connection.execute(
+            text('UPDATE episodes SET key = :key WHERE id = :id'), keys,
+        )
+    connection.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_episodes_feed_name_key '
+        'ON episodes (feed_name, key)'
+    ))
+
+
+def _add_source_validators(connection: Connection):
+    _add_columns(connection, 'sources', [
+        'etag VARCHAR', 'last_modified VARCHAR', 'content_hash VARCHAR',
+    ])
+
+
+def _add_feed_max_items(connection: Connection):
+    _add_columns(connection, 'feeds', ['max_items INTEGER'])
+    connection.execute(
+        text('UPDATE feeds SET max_items = :max_items '
+             'WHERE max_items IS NULL'),
+        {'max_items': int(default_settings['max_items'])},
+    )
+
+
+def _add_episode_indexes(connection: Connection):
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_episodes_feed_name_published '
+        'ON episodes (feed_name, published)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_enclosure_episode_id '
+        'ON enclosure (episode_id)'
+    ))
+
+
+def _add_leases(connection: Connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS leases ('
+        'name VARCHAR NOT NULL PRIMARY KEY, '
+        'holder VARCHAR NOT NULL, '
+        'expires_at DATETIME NOT NULL)'
+    ))
+
+
+def _add_source_polling(connection: Connection):
+    _add_columns(connection, 'sources', [
+        'ttl INTEGER',
+        'published_at DATETIME',
+        'publish_interval INTEGER',
+        "error_count INTEGER DEFAULT '0' NOT NULL",
+        'next_poll_at DATETIME',
+    ])
+    _add_columns(connection, 'episodes', [
+        'source_id INTEGER REFERENCES sources (id)',
+    ])
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_episodes_source_id_published '
+        'ON episodes (source_id, published)'
+    ))
+
+
+def _add_media_probes(connection: Connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS media_probes ('
+        'url VARCHAR NOT NULL PRIMARY KEY, '
+        'length VARCHAR, '
+        'duration VARCHAR, '
+        'error VARCHAR, '
+        'probed_at DATETIME NOT NULL)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_enclosure_url ON enclosure (url)'
+    ))
+
+
+def _add_episode_search(connection: Connection):
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in EPISODES_FTS:
+        connection.execute(text(statement))
+    connection.execute(text(
+        "INSERT INTO episodes_fts (episodes_fts) VALUES ('rebuild')"
+    ))
+
+
+# Version 1 is the schema of the first release, which had no version table.
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _add_episode_keys,
+    _add_source_validators,
+    _add_feed_max_items,
+    _add_episode_indexes,
+    _add_leases,
+    _add_source_polling,
+    _add_media_probes,
+    _add_episode_search,
+]
+
+
+def head() -> int:
+    return 1 + len(MIGRATIONS)
+
+
+def current_version(connection: Connection) -> Optional[int]:
+    if not inspect(connection).has_table('schema_version'):
+        return None
+    return connection.execute(schema_version_table.select()).scalar()
+
+
+def _set_version(connection: Connection, version: int):
+    connection.execute(schema_version_table.delete())
+    connection.execute(schema_version_table.insert(), {'version': version})
+
+
+def migrate(engine: Engine):
+    with engine.begin() as connection:
+        version = current_version(connection)
+        if version is None:
+            version_metadata.create_all(connection)
+            if not inspect(connection).has_table('feeds'):
+                metadata.create_all(connection)
+                _set_version(connection, head())
+                logger.info(f'Database created, schema version {head()}.')
+                return
+            version = 1
+        for number in range(version + 1, head() + 1):
+            MIGRATIONS[number - 2](connection)
+            logger.info(f'Database migrated to schema version {number}.')
+        _set_version(connection, max(version, head()))
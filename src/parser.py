@@ -1,4 +1,9 @@
+from dataclasses import dataclass
+import hashlib
+import io
 import logging
+from typing import BinaryIO, Callable, Iterator, Optional, Union
+
 from lxml import etree
 
 from .date_normalize import normalize_timezone
@@ -8,89 +13,232 @@ logger = logging.getLogger(__name__)
 namespaces = {
     'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd',
     'atom': 'http://www.w3.org/2005/Atom',
+    'sy': 'http://purl.org/rss/1.0/modules/syndication/',
+}
+UPDATE_PERIODS = {
+    'hourly': 60 * 60,
+    'daily': 24 * 60 * 60,
+    'weekly': 7 * 24 * 60 * 60,
+    'monthly': 30 * 24 * 60 * 60,
+    'yearly': 365 * 24 * 60 * 60,
 }
 
 
-def _parse_title(item):
-    if item.find('title') is None:
+ITUNES_AUTHOR = f"{{{namespaces['itunes']}}}author"
+ITUNES_DURATION = f"{{{namespaces['itunes']}}}duration"
+ITUNES_IMAGE = f"{{{namespaces['itunes']}}}image"
+_channel_link = etree.XPath('link/text()')
+_channel_image = etree.XPath('image/url/text()')
+_channel_itunes_image = etree.XPath(
+    'itunes:image/@href', namespaces=namespaces,
+)
+_channel_author = etree.XPath('itunes:author/text()', namespaces=namespaces)
+_channel_ttl = etree.XPath('ttl/text()')
+_channel_update_period = etree.XPath(
+    'sy:updatePeriod/text()', namespaces=namespaces,
+)
+_channel_update_frequency = etree.XPath(
+    'sy:updateFrequency/text()', namespaces=namespaces,
+)
+
+
+def _first(values: list) -> str:
+    return str(values[0]).strip() if values else ''
+
+
+def _refresh_interval(channel) -> Optional[int]:
+    """Seconds the channel asks to be cached, from ttl or sy:updatePeriod."""
+    ttl = _first(_channel_ttl(channel))
+    if ttl.isdigit() and int(ttl):
+        return int(ttl) * 60
+    period = UPDATE_PERIODS.get(_first(_channel_update_period(channel)))
+    if period is None:
+        return None
+    frequency = _first(_channel_update_frequency(channel))
+    if frequency.isdigit() and int(frequency):
+        return period // int(frequency)
+    return period
+
+
+@dataclass
+class ChannelContext:
+    """Channel-level defaults for the items of one document.
+
+    ``ttl`` is the refresh hint of the channel in seconds, if it has one.
+    """
+
+    link: str = ''
+    image: str = ''
+    author: str = ''
+    ttl: Optional[int] = None
+
+    @classmethod
+    def from_channel(cls, channel) -> 'ChannelContext':
+        if channel is None:
+            return cls()
+        return cls(
+            link=_first(_channel_link(channel)),
+            image=(
+                _first(_channel_image(channel)) or
+                _first(_channel_itunes_image(channel))
+            ),
+            author=_first(_channel_author(channel)),
+            ttl=_refresh_interval(channel),
+        )
+
+    @classmethod
+    def from_item(cls, item) -> 'ChannelContext':
+        return cls.from_channel(item.getparent())
+
+
+def _children(item) -> dict:
+    children = {}
+    for child in item:
+        if isinstance(child.tag, str):
+            children.setdefault(child.tag, child)
+    return children
+
+
+def _text(element) -> str:
+    return (element.text or '').strip()
+
+
+def _parse_title(children: dict):
+    if 'title' not in children:
         logger.warning("Can't parse 'title'")
         return ''
-    return item.find('title').text.strip()
+    return _text(children['title'])
 
 
-def _parse_enclosure(item):
-    if item.find('enclosure') is None:
+def _parse_enclosure(children: dict):
+    if 'enclosure' not in children:
         logger.warning("Can't parse 'enclosure'")
         return ''
-    enclosure = dict(item.find('enclosure').attrib)
+    enclosure = children['enclosure'].attrib
     length = enclosure.get('length')
     type_ = enclosure.get('type')
     url = enclosure.get('url')
     return {'length': length, 'type': type_, 'url': url}
 
 
-def _parse_link(item):
-    if item.find('link') is None:
-        return str(*item.xpath('/rss/channel/link/text()'))
-    return item.find('link').text
+def _parse_guid(children: dict):
+    if 'guid' not in children:
+        return ''
+    return _text(children['guid'])
+
+
+def _parse_link(children: dict, context: ChannelContext):
+    if 'link' not in children:
+        return context.link
+    return _text(children['link'])
 
 
-def _parse_published(item):
-    if item.find('pubDate') is None:
+def _parse_published(children: dict):
+    if 'pubDate' not in children:
         logger.warning("Can't parse 'pubDate'")
         return ''
-    return normalize_timezone(item.find('pubDate').text.strip())
+    return normalize_timezone(_text(children['pubDate']))
 
 
-def _parse_description(item):
-    if item.find('description') is None:
+def _parse_description(children: dict):
+    if 'description' not in children:
         logger.warning("Can't parse 'description'")
         return ''
-    return item.find('description').text.strip()
+    return _text(children['description'])
 
 
-def _parse_duration(item):
-    if item.find('itunes:duration', namespaces) is None:
+def _parse_duration(children: dict):
+    if ITUNES_DURATION not in children:
         logger.warning("Can't parse 'duration'")
         return ''
-    return item.find('itunes:duration', namespaces).text
-
-
-def _parse_image(item):
-    if item.find('itunes:image', namespaces) is not None:
-        return item.find('itunes:image', namespaces).attrib['href']
-    return (
-        str(*item.xpath('/rss/channel/image/url/text()')) or
-        str(
-            *item.xpath(
-                '/rss/channel/itunes:image/@href', namespaces=namespaces,
-            )
-        )
-    )
+    return _text(children[ITUNES_DURATION])
+
+
+def _parse_image(children: dict, context: ChannelContext):
+    if ITUNES_IMAGE in children:
+        return children[ITUNES_IMAGE].get('href')
+    return context.image
 
 
-def _parse_author(item):
-    return str(
-        *item.xpath(
-            '/rss/channel/itunes:author/text()', namespaces=namespaces,
-        ),
-    ) or item.find('author').text
+def _parse_author(children: dict, context: ChannelContext):
+    if context.author or 'author' not in children:
+        return context.author
+    return _text(children['author'])
 
 
-def _parse_episode(item) -> dict:
+def _parse_episode(item, context: ChannelContext) -> dict:
+    children = _children(item)
     return {
-        'title': _parse_title(item),
-        'enclosure': _parse_enclosure(item),
-        'link': _parse_link(item),
-        'published': _parse_published(item),
-        'description': _parse_description(item),
-        'duration': _parse_duration(item),
-        'image': _parse_image(item),
-        'author': _parse_author(item),
+        'title': _parse_title(children),
+        'guid': _parse_guid(children),
+        'enclosure': _parse_enclosure(children),
+        'link': _parse_link(children, context),
+        'published': _parse_published(children),
+        'description': _parse_description(children),
+        'duration': _parse_duration(children),
+        'image': _parse_image(children, context),
+        'author': _parse_author(children, context),
     }
 
 
-def get_episodes(rss_str: str) -> dict:
-    feed = etree.XML(rss_str.encode('utf-8'))
-    for item in feed.iter('item'):
-        yield _parse_episode(item)
+LEGACY_KEY_PREFIX = 'legacy:'
+
+
+def _location(episode: dict) -> str:
+    enclosure = episode.get('enclosure') or {}
+    return f"{enclosure.get('url')}|{episode.get('link')}"
+
+
+def episode_key(episode: dict) -> str:
+    """Stable identity of a parsed episode.
+
+    The guid is used when the feed provides one, otherwise the enclosure URL
+    together with the link.
+    """
+    identity = episode.get('guid') or _location(episode)
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def legacy_key(episode: dict) -> str:
+    """Key of the episode as stored by the first release.
+
+    That release did not keep guids, so the episodes it stored are keyed by
+    the enclosure URL and the link, with a prefix no ``episode_key`` has.
+    """
+    location = _location(episode).encode('utf-8')
+    return LEGACY_KEY_PREFIX + hashlib.sha1(location).hexdigest()
+
+
+def get_episodes(
+        rss: Union[str, bytes, BinaryIO],
+        is_known: Callable[[str], bool] = None,
+        on_channel: Callable[[ChannelContext], None] = None,
+) -> Iterator[dict]:
+    """Yield episodes of an RSS document in document order.
+
+    The document is parsed incrementally and every ``item`` is dropped from
+    the tree once it has been parsed. Channel defaults (link, image, author)
+    and the refresh hint are read once, when the first item is reached, and
+    passed to ``on_channel``. Feeds list the newest episodes first, so when
+    ``is_known`` reports the key of an item as already stored, parsing stops
+    there.
+    """
+    if isinstance(rss, str):
+        rss = rss.encode('utf-8')
+    if isinstance(rss, bytes):
+        rss = io.BytesIO(rss)
+    context = None
+    for _, item in etree.iterparse(rss, events=('end',), tag='item'):
+        if context is None:
+            context = ChannelContext.from_item(item)
+            if on_channel is not None:
+                on_channel(context)
+        episode = _parse_episode(item, context)
+        if is_known is not None and is_known(episode_key(episode)):
+            return
+        yield episode
+        item.clear()
+        previous = item.getprevious()
+        while previous is not None and previous.tag == 'item':
+            item.getparent().remove(previous)
+            previous = item.getprevious()
@@ -0,0 +1,109 @@
+"""When to fetch each source next.
+
+Every source has its own schedule. It is learned from how often the source
+publishes: the worker polls rarely right after an episode came out, often
+around the time the next one is expected and a bit less often again when it
+is late. The feed's own ``ttl``/``sy:updatePeriod`` and the ``Cache-Control``
+of the last response are never undercut, errors back off exponentially, and
+every interval is jittered so the sources of one host do not come due
+together.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import random
+from statistics import median
+from typing import Iterable, Optional
+
+from .container import Source
+
+
+HISTORY = 10
+MAX_BACKOFF_STEPS = 16
+
+
+def publish_interval(published: Iterable[datetime]) -> Optional[float]:
+    """Median time in seconds between the given publication dates."""
+    dates = sorted(filter(None, published), reverse=True)
+    gaps = [
+        (newer - older).total_seconds()
+        for newer, older in zip(dates, dates[1:])
+    ]
+    gaps = [gap for gap in gaps if gap > 0]
+    return median(gaps) if gaps else None
+
+
+def is_due(source: Source, now: datetime) -> bool:
+    return source.next_poll_at is None or source.next_poll_at <= now
+
+
+@dataclass
+class PollingPolicy:
+    """Intervals between the fetches of a source, in seconds."""
+
+    min_interval: float = 60
+    max_interval: float = 6 * 60 * 60
+    jitter: float = 0.1
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> 'PollingPolicy':
+        min_interval = float(
+            settings.get('min_poll_interval', settings.get('timeout', 60))
+        )
+        return cls(
+            min_interval=min_interval,
+            max_interval=max(
+                min_interval,
+                float(settings.get('max_poll_interval', cls.max_interval)),
+            ),
+        )
+
+    def cadence_interval(self, source: Source, now: datetime) -> float:
+        """Interval following the publishing cadence of the source."""
+        if not source.publish_interval:
+            return self.min_interval
+        gap = source.publish_interval
+        if source.published_at is None:
+            return gap / 24
+        window = gap / 8
+        until_due = (
+            source.published_at + timedelta(seconds=gap) - now
+        ).total_seconds()
+        if until_due > window:
+            return until_due - window
+        if until_due > -window:
+            return gap / 96
+        return gap / 24
+
+    def interval(
+            self,
+            source: Source,
+            now: datetime,
+            max_age: Optional[float] = None,
+            retry_after: Optional[float] = None,
+    ) -> float:
+        if source.error_count:
+            steps = min(source.error_count, MAX_BACKOFF_STEPS)
+            interval = self.min_interval * 2 ** steps
+        else:
+            interval = max(
+                self.cadence_interval(source, now),
+                source.ttl or 0,
+                max_age or 0,
+            )
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(interval, retry_after or 0)
+
+    def schedule(
+            self,
+            source: Source,
+            now: datetime,
+            failed: bool,
+            max_age: Optional[float] = None,
+            retry_after: Optional[float] = None,
+    ):
+        """Record the outcome of a fetch and set the next one."""
+        source.error_count = (source.error_count or 0) + 1 if failed else 0
+        source.next_poll_at = now + timedelta(
+            seconds=self.interval(source, now, max_age, retry_after),
+        )
@@ -0,0 +1,157 @@
+"""Profiles of a sample of update cycles and requests, written on demand.
+
+Profiling is off until ``rate`` is above 0: from the
+``SINGLEFEED_PROFILE_RATE`` environment variable at start or from the
+admin endpoint at runtime. The runtime rate is kept in the ``rate`` file of
+``directory``, so every web worker and the update worker sharing that
+directory follow it; the variable applies while there is no such file.
+
+Each profiled call writes a cProfile file to ``directory``; read it with
+``pstats`` or turn it into a flame graph with tools like flameprof or
+snakeviz. Only the newest ``max_files`` files are kept.
+"""
+import cProfile
+from functools import wraps
+import itertools
+import logging
+import os
+from pathlib import Path
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileRun:
+    """One profiled call, from ``Profiler.start`` to ``stop``."""
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.profiler._save(self)
+
+
+class Profiler:
+
+    def __init__(
+            self,
+            directory: str = 'profiles',
+            rate: float = 0.0,
+            max_files: int = 50,
+    ):
+        self.directory = Path(directory)
+        self.default_rate = rate
+        self.max_files = max_files
+        self._rate = (None, rate)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._numbers = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> 'Profiler':
+        return cls(
+            directory=os.environ.get('SINGLEFEED_PROFILE_DIR', 'profiles'),
+            rate=float(os.environ.get('SINGLEFEED_PROFILE_RATE', 0)),
+            max_files=int(os.environ.get('SINGLEFEED_PROFILE_MAX_FILES', 50)),
+        )
+
+    @property
+    def rate(self) -> float:
+        """Rate of the ``rate`` file, read again whenever it changes."""
+        path = self.directory / 'rate'
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return self.default_rate
+        read_mtime, rate = self._rate
+        if mtime != read_mtime:
+            try:
+                rate = float(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.error(f'Profiling rate not read from {path}: {e}')
+                return self.default_rate
+            self._rate = (mtime, rate)
+        return rate
+
+    @rate.setter
+    def rate(self, rate: float):
+        path = self.directory / 'rate'
+        temporary = path.with_name(f'.rate.{os.getpid()}')
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(str(rate))
+        os.replace(temporary, path)
+
+    def settings(self) -> dict:
+        return {
+            'directory': str(self.directory),
+            'rate': self.rate,
+            'max_files': self.max_files,
+        }
+
+    def start(self, name: str) -> Optional[ProfileRun]:
+        """Start profiling if this call is sampled, None if it is not.
+
+        Calls made while the thread is profiled already are part of that
+        profile and are not sampled on their own.
+        """
+        if getattr(self._local, 'run', None) is not None:
+            return None
+        rate = self.rate
+        if rate <= 0 or random.random() >= rate:
+            return None
+        self._local.run = ProfileRun(self, name)
+        return self._local.run
+
+    def profiled(self, name: str) -> Callable:
+        """Decorator profiling a sample of the calls of a function."""
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                run = self.start(name)
+                if run is None:
+                    return function(*args, **kwargs)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    run.stop()
+            return wrapper
+        return decorator
+
+    def _save(self, run: ProfileRun):
+        self._local.run = None
+        elapsed = time.perf_counter() - run.started
+        path = self.directory / (
+            f'{run.name}-{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-'
+            f'{next(self._numbers)}.prof'
+        )
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            run.profile.dump_stats(path)
+            self._prune()
+        except OSError as e:
+            logger.error(f'Profile of "{run.name}" not saved: {e}')
+            return
+        logger.info(
+            f'Profile of "{run.name}" ({elapsed:.3f} s) saved to {path}.'
+        )
+
+    def _prune(self):
+        with self._lock:
+            files = sorted(
+                self.directory.glob('*.prof'),
+                key=lambda path: path.stat().st_mtime,
+            )
+            for path in files[:max(0, len(files) - self.max_files)]:
+                path.unlink(missing_ok=True)
+
+
+profiler = Profiler.from_env()
@@ -0,0 +1,182 @@
+"""Read-only queries for the web pages and RSS.
+
+They select plain rows with Core instead of loading mapped objects, so
+rendering a page does not build and track an ORM graph.
+"""
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from .storage import enclosure_table, episodes_table, feeds_table
+
+
+YIELD_PER = 100
+MAX_INTERNED = 10000
+
+
+class Interner:
+    """Share one copy of strings repeated across rows.
+
+    Unlike ``sys.intern`` the table is bounded: it is emptied when it holds
+    ``max_size`` strings, so unique values like per-episode image URLs
+    cannot make it grow for the life of the process.
+    """
+
+    def __init__(self, max_size: int = MAX_INTERNED):
+        self.max_size = max_size
+        self._strings = {}
+
+    def __call__(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        if len(self._strings) >= self.max_size:
+            self._strings = {}
+        return self._strings.setdefault(value, value)
+
+
+intern = Interner()
+
+
+class _View:
+    """Read-only row with slots, compared and shown by its fields."""
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self._fields
+        )
+
+    def __repr__(self) -> str:
+        fields = ', '.join(
+            f'{name}={getattr(self, name)!r}' for name in self._fields
+        )
+        return f'{type(self).__name__}({fields})'
+
+
+class EnclosureView(_View):
+
+    __slots__ = _fields = ('length', 'type', 'url')
+
+    def __init__(self, length: str, type_: str, url: str):
+        self.length = length
+        self.type = intern(type_)
+        self.url = url
+
+
+class EpisodeView(_View):
+    """Episode as rendered, without the bookkeeping of the mapped class.
+
+    Authors, images and enclosure types repeat across the episodes of a
+    feed and are shared.
+    """
+
+    __slots__ = (
+        'id', 'title', 'enclosure', 'link', 'published', 'description',
+        'duration', 'image', 'author',
+    )
+    _fields = __slots__[1:]
+
+    def __init__(
+            self,
+            id_: int,
+            title: str,
+            enclosure: EnclosureView,
+            link: str,
+            published: datetime,
+            description: str,
+            duration: str,
+            image: str,
+            author: str,
+    ):
+        self.id = id_
+        self.title = title
+        self.enclosure = enclosure
+        self.link = link
+        self.published = published
+        self.description = description
+        self.duration = duration
+        self.image = intern(image)
+        self.author = intern(author)
+
+
+def load_feeds(session: Session) -> list[Row]:
+    return session.execute(
+        select(feeds_table.c.name, feeds_table.c.title, feeds_table.c.image)
+        .order_by(feeds_table.c.name)
+    ).all()
+
+
+def load_feed(session: Session, feed_name: str) -> Optional[Row]:
+    return session.execute(
+        select(feeds_table).where(feeds_table.c.name == feed_name)
+    ).first()
+
+
+def count_episodes(session: Session, feed_name: str) -> int:
+    return session.execute(
+        select(func.count()).select_from(episodes_table).where(
+            episodes_table.c.feed_name == feed_name,
+        )
+    ).scalar()
+
+
+def _episodes_page(feed_name: str, limit: int, offset: int):
+    episodes, enclosure = episodes_table.c, enclosure_table.c
+    return select(
+        episodes.id, episodes.title, enclosure.length, enclosure.type,
+        enclosure.url, episodes.link, episodes.published,
+        episodes.description,
+        episodes.duration, episodes.image, episodes.author,
+    ).select_from(
+        episodes_table.outerjoin(
+            enclosure_table, enclosure.episode_id == episodes.id,
+        )
+    ).where(
+        episodes.feed_name == feed_name,
+    ).order_by(
+        episodes.published.desc(), episodes.id.desc(),
+    ).limit(limit).offset(offset)
+
+
+def _episode_view(row: Row) -> EpisodeView:
+    id_, title, length, type_, url, *fields = row
+    return EpisodeView(id_, title, EnclosureView(length, type_, url), *fields)
+
+
+def load_episodes(
+        session: Session, feed_name: str, limit: int, offset: int = 0,
+) -> list[EpisodeView]:
+    """One page of the feed episodes, the newest first."""
+    return [
+        _episode_view(row)
+        for row in session.execute(_episodes_page(feed_name, limit, offset))
+    ]
+
+
+def iter_episodes(
+        session: Session, feed_name: str, limit: int, offset: int = 0,
+) -> Iterator[EpisodeView]:
+    """Same as load_episodes, but fetched from the cursor in batches."""
+    result = session.execute(
+        _episodes_page(feed_name, limit, offset).execution_options(
+            stream_results=True,
+        )
+    )
+    for rows in result.partitions(YIELD_PER):
+        for row in rows:
+            yield _episode_view(row)
+
+
+def last_page(total: int, page_size: int) -> int:
+    return max(1, -(-total // page_size))
@@ -1,18 +1,30 @@
+from typing import Iterable, Iterator, Optional
+
 from lxml import etree
 
-from .container import Feed
+from .container import Episode, Feed
 from .date_normalize import datetime_to_string
 from .parser import namespaces
 
 
-def create_rss(feed: Feed, url_for_feed_image: str) -> bytes:
-    rss = etree.Element(
-        'rss',
-        nsmap={
-            'atom': namespaces['atom'],
-            'itunes': namespaces['itunes'],
-        }
-    )
+nsmap = {
+    'atom': namespaces['atom'],
+    'itunes': namespaces['itunes'],
+}
+_nsmap_declarations = b''.join(
+    f' xmlns:{prefix}="{uri}"'.encode('utf-8')
+    for prefix, uri in nsmap.items()
+)
+_channel_end = b'  </channel>'
+CHUNK_ITEMS = 50
+
+
+def _channel(
+        feed: Feed,
+        url_for_feed_image: str,
+        links: Optional[dict[str, str]],
+) -> etree.Element:
+    rss = etree.Element('rss', nsmap=nsmap)
     channel = etree.SubElement(rss, 'channel')
     feed_title = etree.SubElement(channel, 'title')
     feed_title.text = feed.title
@@ -25,7 +37,8 @@ def create_rss(feed: Feed, url_for_feed_image: str) -> bytes:
     feed_description = etree.SubElement(channel, 'description')
     feed_description.text = feed.description
     last_build_date = etree.SubElement(channel, 'last_build_date')
-    last_build_date.text = datetime_to_string(feed.last_build_date)
+    if feed.last_build_date:
+        last_build_date.text = datetime_to_string(feed.last_build_date)
     itunes_image = etree.SubElement(
         channel, f"{{{namespaces['itunes']}}}image"
     )
@@ -34,37 +47,100 @@ def create_rss(feed: Feed, url_for_feed_image: str) -> bytes:
         channel, f"{{{namespaces['itunes']}}}author"
     )
     author.text = 'singlefeed'
-    for episode in feed.episodes:
-        item = etree.SubElement(channel, 'item')
-        item_title = etree.SubElement(item, 'title')
-        item_title.text = episode.title
+    for rel, href in (links or {}).items():
+        atom_link = etree.SubElement(channel, f"{{{namespaces['atom']}}}link")
+        atom_link.set('rel', rel)
+        atom_link.set('href', href)
+    return rss
+
+
+def _item(episode: Episode) -> bytes:
+    item = etree.Element('item', nsmap=nsmap)
+    item_title = etree.SubElement(item, 'title')
+    item_title.text = episode.title
+    # Items may lack an enclosure, its attributes, a date or an image: the
+    # elements and attributes without a value are left out.
+    if episode.enclosure is not None and episode.enclosure.url:
         enclosure = etree.SubElement(item, 'enclosure')
-        enclosure.set('length', episode.enclosure.length)
-        enclosure.set('type', episode.enclosure.type)
-        enclosure.set('url', episode.enclosure.url)
-        if episode.link:
-            link = etree.SubElement(item, 'link')
-            link.text = episode.link
-        guid = etree.SubElement(item, 'guid')
-        guid.text = episode.link
+        for name in ('length', 'type', 'url'):
+            value = getattr(episode.enclosure, name)
+            if value is not None:
+                enclosure.set(name, value)
+    if episode.link:
+        link = etree.SubElement(item, 'link')
+        link.text = episode.link
+    guid = etree.SubElement(item, 'guid')
+    guid.text = episode.link
+    if episode.published is not None:
         pub_date = etree.SubElement(item, 'pubDate')
         pub_date.text = datetime_to_string(episode.published)
-        item_description = etree.SubElement(item, 'description')
-        item_description.text = episode.description
-        if episode.duration:
-            duration = etree.SubElement(
-                item, f"{{{namespaces['itunes']}}}duration"
-            )
-            duration.text = episode.duration
-        explicit = etree.SubElement(
-            item, f"{{{namespaces['itunes']}}}explicit",
+    item_description = etree.SubElement(item, 'description')
+    item_description.text = episode.description
+    if episode.duration:
+        duration = etree.SubElement(
+            item, f"{{{namespaces['itunes']}}}duration"
         )
-        explicit.text = 'no'
+        duration.text = episode.duration
+    explicit = etree.SubElement(
+        item, f"{{{namespaces['itunes']}}}explicit",
+    )
+    explicit.text = 'no'
+    if episode.image:
         image = etree.SubElement(item, f"{{{namespaces['itunes']}}}image")
         image.set('href', episode.image)
-        author = etree.SubElement(item, 'author')
-        author.text = episode.author
-    return etree.tostring(
-        rss, xml_declaration=True, encoding='utf-8', method="xml",
-        pretty_print=True
+    author = etree.SubElement(item, 'author')
+    author.text = episode.author
+    etree.indent(item, level=2)
+    # The namespaces are declared on <rss> already.
+    return b''.join((
+        b'    ',
+        etree.tostring(item, encoding='utf-8').replace(
+            _nsmap_declarations, b'', 1,
+        ),
+        b'\n',
+    ))
+
+
+def iter_rss(
+        feed: Feed,
+        url_for_feed_image: str,
+        episodes: Optional[Iterable[Episode]] = None,
+        links: Optional[dict[str, str]] = None,
+) -> Iterator[bytes]:
+    """Serialize the feed to RSS chunk by chunk.
+
+    Only the channel header and one chunk of items are held in memory at a
+    time, so ``episodes`` can be a database cursor of any length. The
+    output is the same as the pretty printed document.
+    """
+    if episodes is None:
+        episodes = feed.episodes
+    document = etree.tostring(
+        _channel(feed, url_for_feed_image, links),
+        xml_declaration=True, encoding='utf-8', method='xml',
+        pretty_print=True,
     )
+    head, tail = document.rsplit(_channel_end, 1)
+    chunk = [head]
+    for episode in episodes:
+        chunk.append(_item(episode))
+        if len(chunk) >= CHUNK_ITEMS:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(_channel_end + tail)
+    yield b''.join(chunk)
+
+
+def create_rss(
+        feed: Feed,
+        url_for_feed_image: str,
+        episodes: Optional[Iterable[Episode]] = None,
+        links: Optional[dict[str, str]] = None,
+) -> bytes:
+    """Serialize the feed to RSS.
+
+    ``episodes`` defaults to all episodes of the feed. ``links`` maps link
+    relations to URLs and is written as ``atom:link`` elements, e.g. the
+    ``next`` and ``previous`` pages of a paged feed (RFC 5005).
+    """
+    return b''.join(iter_rss(feed, url_for_feed_image, episodes, links))
@@ -0,0 +1,180 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+import gzip
+import hashlib
+import logging
+import threading
+from typing import Iterable, Iterator, Optional
+
+import brotli
+
+
+logger = logging.getLogger(__name__)
+
+
+def compress(body: bytes) -> dict[str, bytes]:
+    """Compressed variants, the preferred one first."""
+    return {
+        'br': brotli.compress(body),
+        'gzip': gzip.compress(body, mtime=0),
+    }
+
+
+@dataclass
+class CachedRss:
+    """Rendered RSS with its validators and compressed variants."""
+
+    body: bytes
+    url_for_feed_image: str
+    last_modified: Optional[datetime] = None
+    etag: str = field(init=False)
+    variants: dict[str, bytes] = field(init=False)
+
+    def __post_init__(self):
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.variants = compress(self.body)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(map(len, self.variants.values()))
+
+    def negotiate(self, accept_encodings) -> Optional[str]:
+        """Best compressed variant for an ``Accept-Encoding`` header.
+
+        Of the variants the client accepts as much, Brotli is chosen.
+        """
+        qualities = [
+            (accept_encodings[encoding], encoding)
+            for encoding in self.variants
+            if accept_encodings[encoding]
+        ]
+        if not qualities:
+            return None
+        return max(qualities, key=lambda quality: quality[0])[1]
+
+    def encode(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        return self.variants[encoding]
+
+
+class RssCache:
+    """Rendered RSS documents keyed by feed name, base URL and page.
+
+    The least recently used documents are evicted once the total size of the
+    cached bodies and their compressed variants exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+            self,
+            feed_name: str,
+            base_url: str,
+            page: int = 1,
+            last_modified: datetime = None,
+    ) -> Optional[CachedRss]:
+        """Cached document, if it is still of the given feed version.
+
+        Feeds are updated by another process, so a document rendered before
+        the last update of its feed is dropped here instead of being
+        refreshed on update.
+        """
+        key = (feed_name, base_url, page)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.last_modified != last_modified:
+                self._remove(key)
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+            self,
+            feed_name: str,
+            base_url: str,
+            url_for_feed_image: str,
+            body: bytes,
+            last_modified: datetime = None,
+            page: int = 1,
+    ) -> CachedRss:
+        key = (feed_name, base_url, page)
+        entry = CachedRss(body, url_for_feed_image, last_modified)
+        with self._lock:
+            self._remove(key)
+            if entry.size > self.max_bytes:
+                logger.warning(
+                    f'"{feed_name}" RSS of {entry.size} bytes is too large '
+                    f'to cache.'
+                )
+                return entry
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+        return entry
+
+    def tee(
+            self,
+            feed_name: str,
+            base_url: str,
+            url_for_feed_image: str,
+            chunks: Iterable[bytes],
+            last_modified: datetime = None,
+            page: int = 1,
+    ) -> Iterator[bytes]:
+        """Pass the chunks through and cache the whole document.
+
+        Chunks stop being kept as soon as the document outgrows the cache.
+        """
+        kept, size = [], 0
+        for chunk in chunks:
+            size += len(chunk)
+            if kept is not None:
+                kept.append(chunk)
+                if size > self.max_bytes:
+                    kept = None
+            yield chunk
+        if kept is not None:
+            self.put(
+                feed_name, base_url, url_for_feed_image, b''.join(kept),
+                last_modified, page,
+            )
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def invalidate(self, feed_name: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == feed_name]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'stale': self.stale,
+                'entries': len(self._entries),
+                'size': self.size,
+                'max_size': self.max_bytes,
+            }
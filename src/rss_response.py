@@ -0,0 +1,69 @@
+"""RSS responses shared by the Flask app and the ASGI entry point.
+
+Both serve the same feeds, so the image URL, the rendered page and the
+headers of a cached document are made here once.
+"""
+from typing import Iterator, Mapping, Optional
+from urllib.parse import quote
+
+from werkzeug.http import http_date, parse_accept_header
+
+from .asgi import is_not_modified
+from .container import Feed
+from .queries import iter_episodes
+from .rss_builder import iter_rss
+from .rss_cache import CachedRss
+from .storage import session
+
+
+# The characters ``url_for`` leaves unquoted in a path segment.
+PATH_SAFE = "!$&'()*+,/:;=@"
+
+
+def feed_image_url(base_url: str, image: str) -> str:
+    """URL of the feed artwork, quoted like ``url_for('image_folder')``."""
+    return f'{base_url}image/{quote(image, safe=PATH_SAFE)}'
+
+
+def iter_page(
+        feed: Feed, base_url: str, page: int, links: Optional[dict],
+) -> tuple[str, Iterator[bytes]]:
+    """Image URL of the feed and the RSS of one page, chunk by chunk."""
+    url_for_feed_image = feed_image_url(base_url, feed.image)
+    episodes = iter_episodes(
+        session, feed.name, feed.max_items, (page - 1) * feed.max_items,
+    )
+    return url_for_feed_image, iter_rss(
+        feed, url_for_feed_image, episodes, links,
+    )
+
+
+def cached_response(
+        entry: CachedRss, headers: Mapping[str, str],
+) -> tuple[int, list[tuple[str, str]], bytes]:
+    """Status, headers and body of a cached document.
+
+    ``headers`` are the request headers, looked up by lower case names.
+    The body is compressed as the client accepts and left out when the
+    client's copy is still valid.
+    """
+    encoding = entry.negotiate(
+        parse_accept_header(headers.get('accept-encoding')),
+    )
+    etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+    response_headers = [
+        ('Content-Type', 'text/xml; charset=utf-8'),
+        ('ETag', f'"{etag}"'),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    if entry.last_modified is not None:
+        response_headers.append(
+            ('Last-Modified', http_date(entry.last_modified)),
+        )
+    if is_not_modified(headers, etag, entry.last_modified):
+        return 304, response_headers, b''
+    body = entry.encode(encoding)
+    if encoding:
+        response_headers.append(('Content-Encoding', encoding))
+    response_headers.append(('Content-Length', str(len(body))))
+    return 200, response_headers, body
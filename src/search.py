@@ -0,0 +1,112 @@
+"""Search of the episodes of all feeds by title, description and author.
+
+On SQLite the words are looked up in the ``episodes_fts`` index and the
+results ordered by relevance (bm25) or by date. Other backends match the
+words with LIKE, which scans the episodes.
+"""
+from datetime import datetime
+import re
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from .queries import EnclosureView, EpisodeView
+from .storage import enclosure_table, episodes_table
+
+
+ORDERS = ('relevance', 'date')
+episodes_fts = table('episodes_fts')
+
+
+class SearchHit(NamedTuple):
+
+    feed_name: str
+    episode: EpisodeView
+
+
+def terms(query: str) -> list[str]:
+    return re.findall(r'\w+', query)
+
+
+def match_expression(words: list[str]) -> str:
+    """FTS5 query of documents having all words, the last one as a prefix.
+
+    Every word is quoted, so the FTS5 syntax in the query is not
+    interpreted.
+    """
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_episodes(
+        session: Session,
+        query: str,
+        feed_name: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        order: str = 'relevance',
+        limit: int = 20,
+        offset: int = 0,
+) -> list[SearchHit]:
+    """Episodes having every word of ``query``.
+
+    The most relevant come first or, with ``order='date'``, the newest.
+    ``until`` is exclusive.
+    """
+    words = terms(query)
+    if not words:
+        return []
+    episodes, enclosure = episodes_table.c, enclosure_table.c
+    statement = select(
+        episodes.feed_name, episodes.id, episodes.title, enclosure.length,
+        enclosure.type,
+        enclosure.url, episodes.link, episodes.published,
+        episodes.description, episodes.duration, episodes.image,
+        episodes.author,
+    )
+    joined = episodes_table.outerjoin(
+        enclosure_table, enclosure.episode_id == episodes.id,
+    )
+    if session.get_bind().dialect.name == 'sqlite':
+        statement = statement.select_from(
+            joined.join(
+                episodes_fts, literal_column('episodes_fts.rowid') ==
+                episodes.id,
+            )
+        ).where(
+            text('episodes_fts MATCH :match').bindparams(
+                match=match_expression(words),
+            )
+        )
+        relevance = literal_column('episodes_fts.rank')
+    else:
+        statement = statement.select_from(joined).where(and_(*(
+            or_(
+                episodes.title.ilike(f'%{word}%'),
+                episodes.description.ilike(f'%{word}%'),
+                episodes.author.ilike(f'%{word}%'),
+            ) for word in words
+        )))
+        relevance = None
+    if feed_name is not None:
+        statement = statement.where(episodes.feed_name == feed_name)
+    if since is not None:
+        statement = statement.where(episodes.published >= since)
+    if until is not None:
+        statement = statement.where(episodes.published < until)
+    if order == 'relevance' and relevance is not None:
+        statement = statement.order_by(relevance)
+    statement = statement.order_by(
+        episodes.published.desc(), episodes.id.desc(),
+    )
+    return [
+        SearchHit(
+            feed_name,
+            EpisodeView(
+                id_, title, EnclosureView(length, type_, url), *fields,
+            ),
+        ) for feed_name, id_, title, length, type_, url, *fields in
+        session.execute(statement.limit(limit).offset(offset))
+    ]
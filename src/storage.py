@@ -1,18 +1,56 @@
 import logging
+import os
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, \
-    String, Table, create_engine
-from sqlalchemy.orm import Session, registry, relationship
+from sqlalchemy import Column, DateTime, DDL, ForeignKey, Index, Integer, \
+    MetaData, String, Table, create_engine, event, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import registry, relationship, scoped_session, \
+    sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import Insert
 
 from .container import Episode, Enclosure, Feed, Source
 
 
 logger = logging.getLogger(__name__)
 db_file = 'singlefeed.sqlite'
-engine = create_engine(f'sqlite:///{db_file}')
-session = Session(engine)
+db_url = os.environ.get('SINGLEFEED_DATABASE_URL', f'sqlite:///{db_file}')
+pool_size = int(os.environ.get('SINGLEFEED_DATABASE_POOL_SIZE', 10))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # Readers do not block the writer and the writer does not block readers.
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.close()
+
+
+def create_db_engine(url: str) -> Engine:
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(url, pool_size=pool_size, pool_pre_ping=True)
+    if url.database in (None, '', ':memory:'):
+        return create_engine(url)
+    # Pooled connections move between request and scheduler threads.
+    engine_ = create_engine(
+        url,
+        connect_args={'check_same_thread': False},
+        poolclass=QueuePool,
+        pool_size=pool_size,
+    )
+    event.listen(engine_, 'connect', _set_sqlite_pragmas)
+    return engine_
+
+
+engine = create_db_engine(db_url)
+# One session per thread: every request and every scheduler job gets its own
+# and removes it when it is done.
+session = scoped_session(sessionmaker(bind=engine))
 mapper_registry = registry()
-metadata = MetaData(engine)
+metadata = MetaData()
 enclosure_table = Table(
     'enclosure',
     metadata,
@@ -21,6 +59,8 @@ enclosure_table = Table(
     Column('length', String),
     Column('type', String),
     Column('url', String),
+    Index('ix_enclosure_episode_id', 'episode_id'),
+    Index('ix_enclosure_url', 'url'),
 )
 episodes_table = Table(
     'episodes',
@@ -33,14 +73,54 @@ episodes_table = Table(
     Column('description', String),
     Column('duration', String),
     Column('image', String),
-    Column('author', String)
+    Column('author', String),
+    Column('key', String, nullable=False),
+    Column('source_id', Integer, ForeignKey('sources.id')),
+    Index('ix_episodes_feed_name_key', 'feed_name', 'key', unique=True),
+    Index('ix_episodes_feed_name_published', 'feed_name', 'published'),
+    Index('ix_episodes_source_id_published', 'source_id', 'published'),
+)
+# Full-text index of the episodes on SQLite, kept in step with the table by
+# triggers. Other backends search without an index.
+EPISODES_FTS = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS episodes_fts USING fts5('
+    "title, description, author, content='episodes', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS episodes_fts_insert '
+    'AFTER INSERT ON episodes BEGIN '
+    'INSERT INTO episodes_fts (rowid, title, description, author) '
+    'VALUES (new.id, new.title, new.description, new.author); END',
+    'CREATE TRIGGER IF NOT EXISTS episodes_fts_delete '
+    'AFTER DELETE ON episodes BEGIN '
+    'INSERT INTO episodes_fts '
+    '(episodes_fts, rowid, title, description, author) '
+    "VALUES ('delete', old.id, old.title, old.description, old.author); END",
+    'CREATE TRIGGER IF NOT EXISTS episodes_fts_update '
+    'AFTER UPDATE OF title, description, author ON episodes BEGIN '
+    'INSERT INTO episodes_fts '
+    '(episodes_fts, rowid, title, description, author) '
+    "VALUES ('delete', old.id, old.title, old.description, old.author); "
+    'INSERT INTO episodes_fts (rowid, title, description, author) '
+    'VALUES (new.id, new.title, new.description, new.author); END',
 )
+for statement in EPISODES_FTS:
+    event.listen(
+        episodes_table, 'after_create',
+        DDL(statement).execute_if(dialect='sqlite'),
+    )
 sources_table = Table(
     'sources',
     metadata,
     Column('id', Integer, primary_key=True),
     Column('feed_name', String, ForeignKey('feeds.name')),
     Column('url', String),
+    Column('etag', String),
+    Column('last_modified', String),
+    Column('content_hash', String),
+    Column('ttl', Integer),
+    Column('published_at', DateTime),
+    Column('publish_interval', Integer),
+    Column('error_count', Integer, nullable=False, server_default='0'),
+    Column('next_poll_at', DateTime),
 )
 feeds_table = Table(
     'feeds',
@@ -51,9 +131,26 @@ feeds_table = Table(
     Column('language', String),
     Column('description', String),
     Column('image', String),
+    Column('max_items', Integer),
     Column('last_build_date', DateTime)
 
 )
+leases_table = Table(
+    'leases',
+    metadata,
+    Column('name', String, primary_key=True),
+    Column('holder', String, nullable=False),
+    Column('expires_at', DateTime, nullable=False),
+)
+media_probes_table = Table(
+    'media_probes',
+    metadata,
+    Column('url', String, primary_key=True),
+    Column('length', String),
+    Column('duration', String),
+    Column('error', String),
+    Column('probed_at', DateTime, nullable=False),
+)
 mapper_registry.map_imperatively(
     Feed, feeds_table, properties={
         'sources': relationship(Source),
@@ -68,5 +165,19 @@ mapper_registry.map_imperatively(
 )
 mapper_registry.map_imperatively(Enclosure, enclosure_table)
 mapper_registry.map_imperatively(Source, sources_table)
-metadata.drop_all()
-metadata.create_all()
+
+
+def insert_new(table: Table, dialect: str, *index_elements: str) -> Insert:
+    """INSERT that skips rows conflicting on the given unique columns.
+
+    Backends without ``ON CONFLICT`` get a plain INSERT.
+    """
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(
+            index_elements=index_elements,
+        )
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(
+            index_elements=index_elements,
+        )
+    return insert(table)
@@ -0,0 +1,209 @@
+"""Resized artwork, fetched once and kept on disk.
+
+Thumbnails are addressed by the hash of the original image, so the cover
+art shared by all episodes of a show is fetched and resized once per size.
+A small reference file maps every image URL to that hash. When the
+thumbnails take more than ``max_bytes``, the least recently served ones are
+removed.
+
+Thumbnail URLs are signed, so the proxy only fetches images of the feeds.
+The key comes from ``SINGLEFEED_SECRET_KEY`` or is created in the cache
+directory, where every process finds it.
+
+Resizing needs Pillow, which is in the requirements; where it is missing,
+the pages show the original images. Images of more than ``MAX_IMAGE_PIXELS``
+are not decoded.
+"""
+import hashlib
+import hmac
+import io
+import logging
+import os
+from pathlib import Path
+import secrets
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from werkzeug.security import safe_join
+
+try:
+    from PIL import Image
+    from PIL.Image import DecompressionBombError
+except ImportError:
+    Image = None
+    # Caught in ThumbnailCache.get either way.
+    DecompressionBombError = ValueError
+
+
+logger = logging.getLogger(__name__)
+SIZES = (96, 300, 600)
+MAX_IMAGE_BYTES = 20 * 2 ** 20
+# A small compressed file can decode to gigabytes; artwork is at most
+# 3000 pixels square.
+MAX_IMAGE_PIXELS = 6000 * 6000
+MAX_AGE = 365 * 24 * 3600
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def resize(data: bytes, size: int) -> bytes:
+    """JPEG of the image fitted into a ``size`` square."""
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise DecompressionBombError(
+                f'{image.width}x{image.height} pixels',
+            )
+        image.thumbnail((size, size))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def is_remote(source: str) -> bool:
+    return urlsplit(source).scheme in ('http', 'https')
+
+
+def _write(path: Path, data: bytes):
+    """Write atomically, so concurrent readers never see half a file."""
+    temporary = path.with_name(f'.{path.name}.{secrets.token_hex(4)}')
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
+
+
+class ThumbnailCache:
+
+    def __init__(
+            self,
+            directory: str = 'thumbnails',
+            image_folder: str = 'image',
+            max_bytes: int = 256 * 2 ** 20,
+            request_timeout: float = 30,
+    ):
+        self.directory = Path(directory)
+        self.image_folder = image_folder
+        self.max_bytes = max_bytes
+        self.request_timeout = request_timeout
+        self._key = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, image_folder: str = 'image') -> 'ThumbnailCache':
+        return cls(
+            directory=os.environ.get(
+                'SINGLEFEED_THUMBNAIL_DIR', 'thumbnails',
+            ),
+            image_folder=image_folder,
+            max_bytes=int(
+                os.environ.get('SINGLEFEED_THUMBNAIL_CACHE_SIZE', 256)
+            ) * 2 ** 20,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None
+
+    @property
+    def key(self) -> bytes:
+        if self._key is None:
+            key = os.environ.get('SINGLEFEED_SECRET_KEY')
+            if key:
+                self._key = key.encode('utf-8')
+            else:
+                self._key = self._stored_key()
+        return self._key
+
+    def _stored_key(self) -> bytes:
+        path = self.directory / 'key'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(path, 'x') as file:
+                file.write(secrets.token_hex(32))
+        except FileExistsError:
+            pass
+        return path.read_text().strip().encode('utf-8')
+
+    def sign(self, source: str, size: int) -> str:
+        """Signature of the thumbnail of ``source``.
+
+        ``source`` is an image URL or the name of a file in the image folder.
+        """
+        return hmac.new(
+            self.key, f'{size}:{source}'.encode('utf-8'), hashlib.sha256,
+        ).hexdigest()[:32]
+
+    def verify(self, source: str, size: int, signature: str) -> bool:
+        return size in SIZES and hmac.compare_digest(
+            self.sign(source, size), signature,
+        )
+
+    def _path(self, kind: str, name: str) -> Path:
+        return self.directory / kind / name[:2] / name
+
+    def _load(self, source: str) -> bytes:
+        if not is_remote(source):
+            path = safe_join(self.image_folder, source)
+            if path is None:
+                raise FileNotFoundError(source)
+            return Path(path).read_bytes()
+        with requests.get(
+                source, stream=True, timeout=self.request_timeout,
+        ) as response:
+            response.raise_for_status()
+            data = b''
+            for chunk in response.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > MAX_IMAGE_BYTES:
+                    raise ValueError(f'"{source}" is too large')
+        return data
+
+    def get(self, source: str, size: int) -> Optional[tuple[Path, str]]:
+        """Path and ETag of the thumbnail, None if it cannot be made."""
+        reference = self._path('refs', _hash(source.encode('utf-8')))
+        if reference.is_file():
+            name = f'{reference.read_text()}-{size}.jpg'
+            path = self._path('thumbs', name)
+            if path.is_file():
+                os.utime(path)
+                return path, name[:-4]
+        try:
+            data = self._load(source)
+            content = _hash(data)
+            name = f'{content}-{size}.jpg'
+            path = self._path('thumbs', name)
+            if not path.is_file():
+                thumbnail = resize(data, size)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _write(path, thumbnail)
+            reference.parent.mkdir(parents=True, exist_ok=True)
+            _write(reference, content.encode('ascii'))
+        except (
+                OSError, ValueError, requests.RequestException,
+                DecompressionBombError,
+        ) as e:
+            logger.warning(f'Thumbnail of "{source}" not made: {e}')
+            return None
+        self._evict(path)
+        return path, name[:-4]
+
+    def _evict(self, keep: Path):
+        """Remove the oldest thumbnails but ``keep``, the one being served."""
+        with self._lock:
+            files = [
+                (path.stat(), path)
+                for path in (self.directory / 'thumbs').glob('*/*.jpg')
+            ]
+            size = sum(stat.st_size for stat, _ in files)
+            files.sort(key=lambda file: file[0].st_mtime)
+            for stat, path in files:
+                if size <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                path.unlink(missing_ok=True)
+                size -= stat.st_size
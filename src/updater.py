@@ -0,0 +1,514 @@
+from collections import Counter
+from datetime import datetime, timezone
+import heapq
+import itertools
+import logging
+from typing import Callable, Optional
+
+from lxml import etree
+from sqlalchemy import select
+
+from . import parser
+from .container import Episode, Feed, Source
+from .date_normalize import string_to_datetime
+from .fetcher import Fetcher, FetchResult
+from .lease import Lease, LeaseLost
+from .media_probe import enrich_enclosures, MediaProber
+from .metrics import registry
+from .parser import ChannelContext
+from .polling import HISTORY, is_due, publish_interval, PollingPolicy
+from .profiling import profiler
+from .storage import enclosure_table, episodes_table, feeds_table, \
+    insert_new, session, sources_table
+
+
+logger = logging.getLogger(__name__)
+source_stats = Counter()
+BATCH_SIZE = 500
+FIRST_KEY_BATCH = 10
+# Every item is looked up by its key and its legacy key, and SQLite takes
+# at most 999 parameters.
+MAX_KEY_BATCH = 320
+sources_checked = registry.counter(
+    'singlefeed_sources_total',
+    'Sources by outcome of an update: parsed, skipped as unchanged, failed '
+    'or deferred as not due yet.',
+    ('outcome',),
+)
+parse_seconds = registry.histogram(
+    'singlefeed_parse_seconds',
+    'Time to parse a source, checks of stored episodes included.',
+    ('source',),
+)
+parsed_items = registry.counter(
+    'singlefeed_parsed_items_total', 'New episodes found in a source.',
+    ('source',),
+)
+write_seconds = registry.histogram(
+    'singlefeed_db_write_seconds',
+    'Time to write the episodes and schedules of an update cycle.',
+)
+update_seconds = registry.histogram(
+    'singlefeed_update_seconds', 'Duration of update cycles.',
+)
+leader = registry.gauge(
+    'singlefeed_updater_leader', '1 when this worker holds the lease.',
+)
+
+
+def create_feeds(feeds: dict, max_items: int) -> list[Feed]:
+    feeds_list = []
+    for name, feed_data in feeds.items():
+        feed = Feed(
+            name=name,
+            title=feed_data.get('title'),
+            link=feed_data.get('link'),
+            language=feed_data.get('language'),
+            description=feed_data.get('description'),
+            image=feed_data.get('image'),
+            max_items=int(feed_data.get('max_items', max_items)),
+            sources=[Source(url) for url in feed_data.get('sources')],
+        )
+        if feed_data:
+            logger.info(f'"{feed.name}" feed_data created.')
+        else:
+            logger.error(f"Can't to create {name} feed_data")
+        feeds_list.append(feed)
+    return feeds_list
+
+
+def stored_keys(feed: Feed, keys: list[str]) -> set[str]:
+    """Those of ``keys`` that are stored for the feed."""
+    return set(session.execute(
+        select(episodes_table.c.key).where(
+            episodes_table.c.feed_name == feed.name,
+            episodes_table.c.key.in_(keys),
+        )
+    ).scalars())
+
+
+def rekey_episode(feed: Feed, legacy_key: str, key: str):
+    """Give an episode stored under a legacy key the key of its item."""
+    session.execute(
+        episodes_table.update().where(
+            episodes_table.c.feed_name == feed.name,
+            episodes_table.c.key == legacy_key,
+        ).values(key=key)
+    )
+
+
+def new_episodes_list(
+        feed: Feed,
+        rss_: bytes,
+        seen: set[str] = None,
+        on_channel: Callable[[ChannelContext], None] = None,
+) -> list[dict]:
+    """Rows of the episodes that are not stored yet, the enclosure included.
+
+    Feeds list the newest episodes first, so parsing stops at the first
+    stored episode. Items are looked up in batches, from
+    ``FIRST_KEY_BATCH`` items doubling up to ``MAX_KEY_BATCH``, so the
+    queries depend on the number of new items, not on the stored history.
+    An episode stored under its legacy key counts as stored and gets the
+    key of the item.
+    """
+    seen = set() if seen is None else seen
+    parsed = parser.get_episodes(rss_, on_channel=on_channel)
+    episodes = []
+    batch_size = FIRST_KEY_BATCH
+    while True:
+        batch = [
+            (parser.episode_key(episode), parser.legacy_key(episode), episode)
+            for episode in itertools.islice(parsed, batch_size)
+        ]
+        if not batch:
+            return episodes
+        stored = stored_keys(feed, [
+            looked_up for key, legacy_key, _ in batch
+            for looked_up in (key, legacy_key)
+        ])
+        for key, legacy_key, episode in batch:
+            if key in stored:
+                return episodes
+            if legacy_key in stored:
+                rekey_episode(feed, legacy_key, key)
+                return episodes
+            if key in seen:
+                continue
+            seen.add(key)
+            episodes.append({
+                'title': episode['title'],
+                'enclosure': episode['enclosure'] or None,
+                'link': episode['link'],
+                'published': string_to_datetime(episode['published']),
+                'description': episode['description'],
+                'duration': episode['duration'],
+                'image': episode['image'],
+                'author': episode['author'],
+                'key': key,
+            })
+        batch_size = min(batch_size * 2, MAX_KEY_BATCH)
+
+
+def is_unchanged(source: Source, result: FetchResult) -> bool:
+    return result.not_modified or (
+        result.content_hash is not None and
+        result.content_hash == source.content_hash
+    )
+
+
+def count_sources(outcome: str, amount: int = 1):
+    source_stats[outcome] += amount
+    sources_checked.inc(amount, outcome=outcome)
+
+
+def check_source(
+        feed: Feed,
+        source: Source,
+        result: FetchResult,
+        seen: set[str],
+) -> Optional[list[dict]]:
+    """New episodes of a fetched source, None if it could not be read."""
+    if not result.ok:
+        count_sources('failed')
+        return None
+    if is_unchanged(source, result):
+        count_sources('skipped')
+        return []
+
+    def on_channel(context: ChannelContext):
+        source.ttl = context.ttl
+
+    try:
+        with parse_seconds.time(source=source.url):
+            episodes = new_episodes_list(
+                feed, result.content, seen, on_channel,
+            )
+    except etree.XMLSyntaxError as e:
+        logger.error(f'"{source.url}" is not a valid RSS: {e}')
+        count_sources('failed')
+        return None
+    except (etree.LxmlError, AttributeError, TypeError, ValueError) as e:
+        # One odd document must not stop the update of the other sources.
+        logger.exception(f'"{source.url}" could not be parsed: {e}')
+        count_sources('failed')
+        return None
+    source.etag = result.etag
+    source.last_modified = result.last_modified
+    source.content_hash = result.content_hash
+    count_sources('parsed')
+    parsed_items.inc(len(episodes), source=source.url)
+    for episode in episodes:
+        episode['feed_name'] = feed.name
+        episode['source_id'] = source.id
+    return episodes
+
+
+def _utc(date: datetime) -> datetime:
+    if date.tzinfo is None:
+        return date
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _published_key(episode: dict) -> tuple[bool, datetime]:
+    published = episode['published']
+    return published is not None, _utc(published or datetime.min)
+
+
+def merge_episodes(streams: list[list[dict]]) -> list[dict]:
+    """Episodes of several sources in one list, the oldest first.
+
+    Sources list their episodes in date order, so every stream is put in
+    order in linear time and the streams are merged with a heap: merging
+    N episodes of k sources takes O(N log k). Rows are inserted in this
+    order, so the ids of a feed follow the publication dates, which
+    breaks ties between episodes published at the same time.
+    """
+    return list(heapq.merge(
+        *(sorted(stream, key=_published_key) for stream in streams),
+        key=_published_key,
+    ))
+
+
+def learn_cadence(feed: Feed, source: Source, episodes: list[dict]):
+    """Update what is known about how often the source publishes.
+
+    Episodes stored before they were linked to their source are used for
+    feeds with a single source.
+    """
+    published = [episode['published'] for episode in episodes]
+    if any(published):
+        source.published_at = _utc(max(filter(None, published)))
+    if not episodes and source.publish_interval is not None:
+        return
+    query = session.query(Episode.published)
+    if len(feed.sources) == 1:
+        query = query.filter(Episode.feed_name == feed.name)
+    else:
+        query = query.filter(Episode.source_id == source.id)
+    interval = publish_interval(
+        published for published, in query.order_by(
+            Episode.published.desc(),
+        ).limit(HISTORY)
+    )
+    if interval is not None:
+        source.publish_interval = int(interval)
+
+
+@profiler.profiled('check_update')
+def check_update(
+        feed: Feed, fetched: dict[int, FetchResult],
+) -> list[tuple[Source, FetchResult, Optional[list[dict]]]]:
+    """New episodes of every fetched source of the feed."""
+    checked = []
+    seen = set()
+    logger.info(f'"{feed.name}" check updates...')
+    for source in feed.sources:
+        result = fetched.get(source.id)
+        if result is not None:
+            episodes = check_source(feed, source, result, seen)
+            checked.append((source, result, episodes))
+    added = sum(len(episodes or []) for *_, episodes in checked)
+    if added:
+        feed.last_build_date = datetime.now().astimezone()
+        logger.info(f'"{feed.name}" {added} new episodes added.')
+    else:
+        logger.info(f'"{feed.name}" feed is up to date.')
+    return checked
+
+
+def insert_episodes(episodes: list[dict], batch_size: int = BATCH_SIZE):
+    """Insert episode rows and their enclosures, ``batch_size`` at a time.
+
+    Every batch takes one multi-row INSERT for the episodes, one SELECT of
+    their ids and one INSERT for the enclosures. Episodes already stored
+    under the same key are skipped.
+    """
+    insert_episode = insert_new(
+        episodes_table, session.get_bind().dialect.name, 'feed_name', 'key',
+    )
+    episodes_, enclosure = episodes_table.c, enclosure_table.c
+    for start in range(0, len(episodes), batch_size):
+        batch = episodes[start:start + batch_size]
+        session.execute(
+            insert_episode,
+            [
+                {
+                    name: value for name, value in episode.items()
+                    if name != 'enclosure'
+                } for episode in batch
+            ],
+        )
+        without_enclosure = session.execute(
+            select(episodes_.feed_name, episodes_.key, episodes_.id)
+            .select_from(
+                episodes_table.outerjoin(
+                    enclosure_table, enclosure.episode_id == episodes_.id,
+                )
+            ).where(
+                episodes_.key.in_([episode['key'] for episode in batch]),
+                enclosure.id.is_(None),
+            )
+        )
+        ids = {
+            (feed_name, key): id_
+            for feed_name, key, id_ in without_enclosure
+        }
+        enclosures = [
+            dict(
+                episode['enclosure'],
+                episode_id=ids[episode['feed_name'], episode['key']],
+            )
+            for episode in batch
+            if episode['enclosure'] and
+            (episode['feed_name'], episode['key']) in ids
+        ]
+        if enclosures:
+            session.execute(enclosure_table.insert(), enclosures)
+
+
+@profiler.profiled('update_feeds')
+def update_feeds(
+        fetcher: Fetcher,
+        policy: PollingPolicy,
+        batch_size: int = BATCH_SIZE,
+        lease: Optional[Lease] = None,
+):
+    """Fetch the sources that are due and update their feeds.
+
+    All new episodes of the cycle are written in one transaction, together
+    with the schedule of the fetched sources. With a ``lease``, that
+    transaction renews it first, so nothing is written once another worker
+    has taken it over during the fetches.
+    """
+    try:
+        now = datetime.utcnow()
+        feeds = session.query(Feed).all()
+        sources = [
+            source for feed in feeds for source in feed.sources
+            if is_due(source, now)
+        ]
+        count_sources(
+            'deferred',
+            sum(len(feed.sources) for feed in feeds) - len(sources),
+        )
+        fetched = fetcher.fetch_all(sources)
+        checked = [
+            (feed, *source_check)
+            for feed in feeds
+            if any(source.id in fetched for source in feed.sources)
+            for source_check in check_update(feed, fetched)
+        ]
+        with write_seconds.time():
+            if lease is not None:
+                lease.renew(session)
+            insert_episodes(
+                [
+                    episode for feed in feeds
+                    for episode in merge_episodes([
+                        episodes for feed_, _, _, episodes in checked
+                        if feed_ is feed and episodes
+                    ])
+                ],
+                batch_size,
+            )
+            for feed, source, result, episodes in checked:
+                if episodes is not None:
+                    learn_cadence(feed, source, episodes)
+                policy.schedule(
+                    source, now, episodes is None,
+                    result.max_age, result.retry_after,
+                )
+            session.commit()
+    finally:
+        session.remove()
+    logger.info(
+        f'Sources parsed: {source_stats["parsed"]}, '
+        f'skipped as unchanged: {source_stats["skipped"]}, '
+        f'not due yet: {source_stats["deferred"]}.'
+    )
+
+
+def delete_feed(name: str):
+    episode_ids = select(episodes_table.c.id).where(
+        episodes_table.c.feed_name == name,
+    )
+    session.execute(
+        enclosure_table.delete().where(
+            enclosure_table.c.episode_id.in_(episode_ids),
+        )
+    )
+    session.execute(
+        episodes_table.delete().where(episodes_table.c.feed_name == name)
+    )
+    session.execute(
+        sources_table.delete().where(sources_table.c.feed_name == name)
+    )
+    session.execute(feeds_table.delete().where(feeds_table.c.name == name))
+
+
+def reconcile_feeds(feeds: list[Feed], lease: Optional[Lease] = None):
+    """Make the stored feeds and sources match the config.
+
+    Episodes of the feeds that stay in the config are kept. With a
+    ``lease``, the changes are only written while it is held.
+    """
+    stored = {feed.name: feed for feed in session.query(Feed)}
+    for feed in feeds:
+        current = stored.pop(feed.name, None)
+        if current is None:
+            session.add(feed)
+            logger.info(f'"{feed.name}" feed added.')
+            continue
+        for attribute in (
+                'title', 'link', 'language', 'description', 'image',
+                'max_items',
+        ):
+            setattr(current, attribute, getattr(feed, attribute))
+        urls = [source.url for source in feed.sources]
+        for source in list(current.sources):
+            if source.url not in urls:
+                current.sources.remove(source)
+                session.execute(
+                    episodes_table.update().where(
+                        episodes_table.c.source_id == source.id,
+                    ).values(source_id=None)
+                )
+                session.delete(source)
+                logger.info(f'"{feed.name}" source {source.url} removed.')
+        stored_urls = {source.url for source in current.sources}
+        for url in urls:
+            if url not in stored_urls:
+                current.sources.append(Source(url))
+                logger.info(f'"{feed.name}" source {url} added.')
+    for name in stored:
+        delete_feed(name)
+        logger.info(f'"{name}" feed removed.')
+    if lease is not None:
+        lease.renew(session)
+    session.commit()
+
+
+class Updater:
+    """Update the feeds when this worker holds the updater lease.
+
+    Every worker runs ``run`` on schedule, but only the holder of the lease
+    fetches sources and writes episodes. The holder also brings the stored
+    feeds in line with its config when it takes the lease. With a
+    ``prober``, up to ``max_probes`` media files lacking a size or duration
+    are probed after every update.
+    """
+
+    def __init__(
+            self,
+            feeds: list[Feed],
+            fetcher: Fetcher,
+            lease: Lease,
+            policy: PollingPolicy,
+            batch_size: int = BATCH_SIZE,
+            prober: Optional[MediaProber] = None,
+            max_probes: int = 0,
+    ):
+        self.feeds = feeds
+        self.fetcher = fetcher
+        self.lease = lease
+        self.policy = policy
+        self.batch_size = batch_size
+        self.prober = prober
+        self.max_probes = max_probes
+        self.leading = False
+
+    def _step_down(self):
+        if self.leading:
+            logger.warning('Updater lease lost.')
+        else:
+            logger.info('Another worker updates the feeds.')
+        self.leading = False
+        leader.set(0)
+
+    def run(self):
+        """Update the feeds, renewing the lease before every write.
+
+        A cycle can outlast the lease; when another worker has taken it
+        over meanwhile, the pending writes are dropped.
+        """
+        if not self.lease.acquire():
+            self._step_down()
+            return
+        try:
+            if not self.leading:
+                logger.info(f'Updater lease taken by {self.lease.holder}.')
+                try:
+                    reconcile_feeds(self.feeds, self.lease)
+                finally:
+                    session.remove()
+                self.leading = True
+                leader.set(1)
+            with update_seconds.time():
+                update_feeds(
+                    self.fetcher, self.policy, self.batch_size, self.lease,
+                )
+            if self.prober is not None and self.max_probes > 0:
+                enrich_enclosures(self.prober, self.max_probes, self.lease)
+        except LeaseLost:
+            self._step_down()
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime
+from unittest import TestCase
+
+from src import asgi
+from src.asgi import is_not_modified, send_response, wsgi_app_to_asgi
+
+
+def make_scope(path, query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string,
+        'headers': [
+            (name.encode(), value.encode())
+            for name, value in (('host', 'example.com'), *headers)
+        ],
+        'scheme': 'http',
+        'server': ('example.com', 80),
+    }
+
+
+def call(app, scope) -> list[dict]:
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'body'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class IsNotModifiedTestCase(TestCase):
+
+    def test__etag(self):
+        self.assertTrue(
+            is_not_modified({'if-none-match': '"a", "b"'}, 'b', None),
+        )
+        self.assertTrue(is_not_modified({'if-none-match': 'W/"b"'}, 'b', None))
+        self.assertFalse(is_not_modified({'if-none-match': '"a"'}, 'b', None))
+
+    def test__last_modified(self):
+        headers = {'if-modified-since': 'Fri, 11 Dec 2020 11:55:40 GMT'}
+        self.assertTrue(
+            is_not_modified(headers, 'b', datetime(2020, 12, 11, 11, 55, 40)),
+        )
+        self.assertFalse(
+            is_not_modified(headers, 'b', datetime(2020, 12, 11, 11, 55, 41)),
+        )
+        self.assertFalse(is_not_modified({}, 'b', datetime(2020, 12, 11)))
+
+
+class SendResponseTestCase(TestCase):
+
+    def test__chunks(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        body = b'x' * (asgi.CHUNK_SIZE + 1)
+        asyncio.run(send_response(send, 200, [('Content-Type', 'a/b')], body))
+        self.assertEqual(
+            [asgi.CHUNK_SIZE, 1, 0],
+            [len(message['body']) for message in sent[1:]],
+        )
+        self.assertEqual([(b'Content-Type', b'a/b')], sent[0]['headers'])
+
+
+class WsgiAppToAsgiTestCase(TestCase):
+
+    def test__call(self):
+        def wsgi_app(environ, start_response):
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            return [
+                environ['QUERY_STRING'].encode(), b' ',
+                environ['HTTP_HOST'].encode(), b' ',
+                environ['wsgi.input'].read(),
+            ]
+
+        sent = call(
+            wsgi_app_to_asgi(wsgi_app),
+            make_scope('/caf%C3%A9', b'page=2'),
+        )
+        self.assertEqual(201, sent[0]['status'])
+        self.assertEqual(
+            [(b'X-Path', '/café'.encode('utf-8'))],
+            sent[0]['headers'],
+        )
+        self.assertEqual(
+            b'page=2 example.com body',
+            b''.join(message['body'] for message in sent[1:]),
+        )
@@ -2,7 +2,8 @@ from datetime import datetime, timedelta, timezone
 from unittest import TestCase
 from unittest.mock import patch
 
-from src.date_normalize import string_to_datetime, normalize_timezone
+from src.date_normalize import logger, parse_date, string_to_datetime, \
+    normalize_timezone
 
 
 class StringToDateTestCase(TestCase):
@@ -40,26 +41,92 @@ class StringToDateTestCase(TestCase):
         self.assertEqual(
             cm.output,
             [
-                "ERROR:src.date_normalize:time data 'test' does not match "
-                "format '%a, %d %b %Y %H:%M:%S %z'"
+                "ERROR:src.date_normalize:time data 'test' is not an "
+                "RFC 822 or ISO 8601 date"
             ]
         )
 
 
+class ParseDateTestCase(TestCase):
+
+    def test__named_timezones(self):
+        offsets = {
+            'GMT': timedelta(0),
+            'EDT': timedelta(hours=-4),
+            'CEST': timedelta(hours=2),
+            'IST': timedelta(hours=5, minutes=30),
+        }
+        for name, offset in offsets.items():
+            self.assertEqual(
+                datetime(2020, 12, 11, 11, 55, 40, tzinfo=timezone(offset)),
+                parse_date(f'Fri, 11 Dec 2020 11:55:40 {name}'),
+            )
+
+    def test__loose_rfc_822(self):
+        expected = datetime(2020, 9, 1, 11, 55, tzinfo=timezone.utc)
+        for string in (
+                '1 Sep 2020 11:55 +0000',
+                'Tuesday, 01 Sept 2020 11:55:00 +00:00',
+                ' Tue, 1 sep 20 11:55:00 ',
+        ):
+            self.assertEqual(expected, parse_date(string))
+
+    def test__iso_8601(self):
+        self.assertEqual(
+            datetime(2020, 12, 11, 11, 55, 40, tzinfo=timezone.utc),
+            parse_date('2020-12-11T11:55:40Z'),
+        )
+        self.assertEqual(
+            datetime(
+                2020, 12, 11, 11, 55, 40,
+                tzinfo=timezone(timedelta(hours=3)),
+            ),
+            parse_date('2020-12-11T11:55:40+03:00'),
+        )
+
+    def test__invalid(self):
+        for string in (
+                'test', 'Fri, 31 Feb 2020 11:55:40 +0000',
+                'Fri, 11 Dec 2020 11:55:40 XYZ',
+        ):
+            self.assertIsNone(parse_date(string))
+
+    def test__cached(self):
+        parse_date.cache_clear()
+        parse_date('Fri, 11 Dec 2020 11:55:40 +0000')
+        parse_date('Fri, 11 Dec 2020 11:55:40 +0000')
+        self.assertEqual(1, parse_date.cache_info().hits)
+
+
 class NormalizeTimezoneTestCase(TestCase):
 
+    def test__normalize_timezone__zero_offset(self):
+        with patch.object(logger, 'info') as info:
+            for zone in ('GMT', 'UT', 'Z'):
+                string = f'Fri, 11 Dec 2020 11:55:40 {zone}'
+                self.assertEqual(string, normalize_timezone(string))
+                self.assertEqual(
+                    datetime(2020, 12, 11, 11, 55, 40, tzinfo=timezone.utc),
+                    parse_date(string),
+                )
+        info.assert_not_called()
+
     def test__normalize_timezone(self):
         input_strings = [
             'Fri, 11 Dec 2020 11:55:40 +0000',
             'Fri, 11 Dec 2020 11:55:40 EST',
             'Fri, 11 Dec 2020 11:55:40 PDT',
             'Fri, 11 Dec 2020 11:55:40 PST',
+            'Fri, 11 Dec 2020 11:55:40 NST',
+            'Fri, 11 Dec 2020 11:55:40 JST',
         ]
         expected_result = [
             'Fri, 11 Dec 2020 11:55:40 +0000',
             'Fri, 11 Dec 2020 11:55:40 -0500',
             'Fri, 11 Dec 2020 11:55:40 -0700',
             'Fri, 11 Dec 2020 11:55:40 -0800',
+            'Fri, 11 Dec 2020 11:55:40 -0330',
+            'Fri, 11 Dec 2020 11:55:40 +0900',
         ]
         self.assertEqual(
             expected_result,
@@ -0,0 +1,166 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from src.container import Source
+from src.fetcher import cache_max_age, conditional_headers, Fetcher, \
+    retry_after
+
+
+def make_source(id_, url):
+    source = Source(url)
+    source.id = id_
+    return source
+
+
+class FetcherTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+
+    def fake_get(self, url, headers, timeout):
+        host = url.split('/')[2]
+        with self.lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.running[host])
+        time.sleep(0.05)
+        with self.lock:
+            self.running[host] -= 1
+        return MagicMock(
+            text=url, content=url.encode(), status_code=200, headers={},
+        )
+
+    def test__fetch_all__per_host_limit(self):
+        sources = [
+            make_source(i, f'http://host{i % 2}.com/{i}') for i in range(8)
+        ]
+        fetcher = Fetcher(max_connections=8, max_connections_per_host=2)
+        with patch.object(requests.Session, 'get', self.fake_get):
+            results = fetcher.fetch_all(sources)
+        self.assertEqual(
+            {source.id: source.url for source in sources},
+            {id_: result.content.decode() for id_, result in results.items()},
+        )
+        self.assertEqual({'host0.com': 2, 'host1.com': 2}, self.peak)
+
+    def test__fetch_all__slow_host_does_not_hold_up_others(self):
+        finished = {}
+
+        def get(session, url, headers, timeout):
+            time.sleep(0.2 if 'slow' in url else 0.01)
+            finished[url] = time.monotonic()
+            return MagicMock(content=b'', status_code=200, headers={})
+
+        sources = [
+            make_source(i, f'http://slow.com/{i}') for i in range(8)
+        ] + [make_source(i, f'http://fast.com/{i}') for i in (8, 9)]
+        fetcher = Fetcher(max_connections=4, max_connections_per_host=2)
+        started = time.monotonic()
+        with patch.object(requests.Session, 'get', get):
+            self.assertEqual(10, len(fetcher.fetch_all(sources)))
+        fast = [
+            finished[url] - started for url in finished if 'fast' in url
+        ]
+        self.assertLess(max(fast), 0.1)
+
+    def test__fetch_all__runs_concurrently(self):
+        sources = [make_source(i, f'http://host{i}.com/') for i in range(8)]
+        fetcher = Fetcher(max_connections=8)
+        started = time.monotonic()
+        with patch.object(requests.Session, 'get', self.fake_get):
+            fetcher.fetch_all(sources)
+        self.assertLess(time.monotonic() - started, 0.05 * 4)
+
+    def test__fetch__error(self):
+        fetcher = Fetcher(request_timeout=1)
+        with patch.object(
+                requests.Session, 'get', side_effect=requests.Timeout('slow'),
+        ):
+            with self.assertLogs('src.fetcher') as cm:
+                result = fetcher.fetch(
+                    make_source(1, 'http://example.com/rss'),
+                )
+        self.assertFalse(result.ok)
+        self.assertEqual(
+            cm.output,
+            ['ERROR:src.fetcher:"http://example.com/rss" fetch failed: slow'],
+        )
+
+
+class ConditionalFetchTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.source = make_source(1, 'http://example.com/rss')
+        self.source.etag = '"abc"'
+        self.source.last_modified = 'Fri, 11 Dec 2020 11:55:40 GMT'
+
+    def test__conditional_headers(self):
+        self.assertEqual(
+            {
+                'If-None-Match': '"abc"',
+                'If-Modified-Since': 'Fri, 11 Dec 2020 11:55:40 GMT',
+            },
+            conditional_headers(self.source),
+        )
+        self.assertEqual({}, conditional_headers(Source('http://a.com')))
+
+    def test__fetch__not_modified(self):
+        response = MagicMock(status_code=304, headers={'ETag': '"abc"'})
+        with patch.object(
+                requests.Session, 'get', return_value=response,
+        ) as get_mock:
+            result = Fetcher().fetch(self.source)
+        self.assertEqual(
+            conditional_headers(self.source),
+            get_mock.call_args.kwargs['headers'],
+        )
+        self.assertTrue(result.not_modified)
+        self.assertIsNone(result.content)
+        self.assertEqual('"abc"', result.etag)
+
+    def test__fetch__content_hash(self):
+        response = MagicMock(
+            status_code=200, headers={}, text='<rss/>', content=b'<rss/>',
+        )
+        with patch.object(requests.Session, 'get', return_value=response):
+            result = Fetcher().fetch(self.source)
+        self.assertFalse(result.not_modified)
+        self.assertEqual(b'<rss/>', result.content)
+        self.assertEqual(
+            'b8a3805e669decf7180d8c7f4af5d4706d615d0678c424bd1c6b853def3bf3d2',
+            result.content_hash,
+        )
+
+
+class PollingHeadersTestCase(TestCase):
+
+    def test__cache_max_age(self):
+        self.assertEqual(
+            600, cache_max_age({'Cache-Control': 'public, max-age=600'}),
+        )
+        self.assertIsNone(cache_max_age({'Cache-Control': 'no-cache'}))
+        self.assertIsNone(cache_max_age({}))
+
+    def test__retry_after(self):
+        self.assertEqual(120, retry_after({'Retry-After': '120'}))
+        self.assertEqual(
+            0, retry_after({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}),
+        )
+        self.assertIsNone(retry_after({'Retry-After': 'soon'}))
+        self.assertIsNone(retry_after({}))
+
+    def test__fetch__retry_after(self):
+        response = MagicMock(status_code=503, headers={'Retry-After': '60'})
+        response.raise_for_status.side_effect = requests.HTTPError(
+            '503', response=response,
+        )
+        with patch.object(requests.Session, 'get', return_value=response):
+            with self.assertLogs('src.fetcher'):
+                result = Fetcher().fetch(make_source(1, 'http://a.com/rss'))
+        self.assertFalse(result.ok)
+        self.assertEqual(60, result.retry_after)
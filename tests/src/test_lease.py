@@ -0,0 +1,52 @@
+from datetime import timedelta
+from unittest import TestCase
+
+from src.lease import Lease, LeaseLost
+from src.migrations import migrate
+from src.storage import create_db_engine
+
+
+class LeaseTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_db_engine('sqlite://')
+        migrate(self.engine)
+        self.first = Lease(self.engine, 'updater', timedelta(minutes=1))
+        self.second = Lease(self.engine, 'updater', timedelta(minutes=1))
+
+    def test__one_holder(self):
+        self.assertTrue(self.first.acquire())
+        self.assertFalse(self.second.acquire())
+        self.assertTrue(self.first.acquire())
+
+    def test__release(self):
+        self.first.acquire()
+        self.first.release()
+        self.assertTrue(self.second.acquire())
+        self.assertFalse(self.first.acquire())
+
+    def test__expired(self):
+        self.first.ttl = timedelta(seconds=-1)
+        self.first.acquire()
+        self.assertTrue(self.second.acquire())
+        self.assertFalse(self.first.acquire())
+
+    def test__renew(self):
+        self.first.ttl = timedelta(seconds=-1)
+        self.first.acquire()
+        self.first.ttl = timedelta(minutes=1)
+        with self.engine.begin() as connection:
+            self.first.renew(connection)
+        self.assertFalse(self.second.acquire())
+
+    def test__renew__taken_over(self):
+        self.first.ttl = timedelta(seconds=-1)
+        self.first.acquire()
+        self.second.acquire()
+        with self.assertRaises(LeaseLost), self.engine.begin() as connection:
+            self.first.renew(connection)
+
+    def test__other_name(self):
+        self.first.acquire()
+        other = Lease(self.engine, 'other', timedelta(minutes=1))
+        self.assertTrue(other.acquire())
@@ -0,0 +1,173 @@
+from datetime import datetime
+import struct
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from src import storage
+from src.container import Feed
+from src.media_probe import enrich_enclosures, format_duration, id3_size, \
+    MediaInfo, MediaProber, mp3_duration, mp4_duration
+from src.migrations import migrate
+from src.storage import create_db_engine, enclosure_table, episodes_table, \
+    feeds_table, session
+
+
+# MPEG 1 layer III, 128 kbit/s, 44100 Hz, stereo: 417 bytes a frame.
+FRAME_HEADER = b'\xff\xfb\x90\x00'
+FRAME_SIZE = 417
+
+
+def frame(payload=b''):
+    return (FRAME_HEADER + payload).ljust(FRAME_SIZE, b'\x00')
+
+
+def id3_tag(size):
+    syncsafe = bytes((size >> shift) & 0x7f for shift in (21, 14, 7, 0))
+    return b'ID3\x03\x00\x00' + syncsafe + b'\x00' * size
+
+
+class Mp3TestCase(TestCase):
+
+    def test__id3_size(self):
+        self.assertEqual(id3_size(id3_tag(300) + frame()), 310)
+        self.assertEqual(id3_size(frame()), 0)
+
+    def test__mp3_duration__xing_header(self):
+        xing = b'\x00' * 32 + b'Xing' + struct.pack('>II', 1, 1000)
+        duration = mp3_duration(frame(xing) + frame(), None)
+        self.assertAlmostEqual(duration, 1000 * 1152 / 44100)
+
+    def test__mp3_duration__constant_bitrate(self):
+        data = b'\x00\x01' + frame() + frame()
+        self.assertAlmostEqual(
+            mp3_duration(data, 1_600_002 + 100, 100), 100,
+        )
+
+    def test__mp3_duration__no_frame(self):
+        self.assertIsNone(mp3_duration(b'\xff\xfb' + b'\x00' * 100, 10 ** 6))
+        self.assertIsNone(mp3_duration(frame(), None))
+
+
+class Mp4TestCase(TestCase):
+
+    def test__mp4_duration(self):
+        mvhd = (
+            struct.pack('>I', 108) + b'mvhd' + b'\x00' * 12 +
+            struct.pack('>II', 1000, 3_723_000)
+        )
+        data = b'\x00\x00\x00\x18ftypM4A ' + b'\x00' * 12 + b'moov' + mvhd
+        self.assertEqual(mp4_duration(data), 3723)
+        self.assertEqual(format_duration(mp4_duration(data)), '1:02:03')
+
+    def test__mp4_duration__no_mvhd(self):
+        self.assertIsNone(mp4_duration(b'\x00\x00\x00\x18ftypM4A '))
+
+
+class TruncatedHeaderProber(MediaProber):
+
+    def _session(self):
+        return MagicMock(**{
+            'head.return_value.headers': {'Content-Length': '1000'},
+            'head.return_value.status_code': 200,
+        })
+
+    def _range(self, url, start):
+        # The Xing header is cut right after its name.
+        return FRAME_HEADER + b'\x00' * 32 + b'Xing\x00\x00', None
+
+
+class ProbeTestCase(TestCase):
+
+    def test__probe__truncated_header(self):
+        info = TruncatedHeaderProber().probe('a.mp3')
+        self.assertEqual(1000, info.length)
+        self.assertIsNone(info.duration)
+        self.assertTrue(info.error.startswith('Unreadable header'))
+
+
+class FakeProber(MediaProber):
+
+    def __init__(self):
+        super().__init__()
+        self.probed = []
+
+    def probe(self, url):
+        self.probed.append(url)
+        if url == 'broken.mp3':
+            return MediaInfo(error='404')
+        return MediaInfo(1000, 90)
+
+
+class EnrichEnclosuresTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_db_engine('sqlite://')
+        migrate(self.engine)
+        session.remove()
+        session.configure(bind=self.engine)
+        session.add(
+            Feed(
+                name='feed', title='', link='', language='',
+                description='', image='',
+            )
+        )
+        for id_, (url, length, duration) in enumerate((
+                ('a.mp3', '0', ''),
+                ('b.mp3', '500', '1:00'),
+                ('broken.mp3', None, ''),
+        ), 1):
+            session.execute(episodes_table.insert(), {
+                'id': id_, 'feed_name': 'feed', 'key': url,
+                'duration': duration,
+            })
+            session.execute(enclosure_table.insert(), {
+                'episode_id': id_, 'url': url, 'length': length,
+            })
+        session.commit()
+
+    def tearDown(self) -> None:
+        session.remove()
+        session.configure(bind=storage.engine)
+
+    def stored(self):
+        return session.execute(
+            episodes_table.join(
+                enclosure_table,
+                enclosure_table.c.episode_id == episodes_table.c.id,
+            ).select().with_only_columns(
+                enclosure_table.c.url,
+                enclosure_table.c.length,
+                episodes_table.c.duration,
+            ).order_by(enclosure_table.c.url)
+        ).all()
+
+    def test__enrich_enclosures(self):
+        prober = FakeProber()
+        enrich_enclosures(prober)
+        self.assertEqual(sorted(prober.probed), ['a.mp3', 'broken.mp3'])
+        self.assertEqual(self.stored(), [
+            ('a.mp3', '1000', '1:30'),
+            ('b.mp3', '500', '1:00'),
+            ('broken.mp3', None, ''),
+        ])
+        self.assertIsNotNone(
+            session.execute(feeds_table.select()).one().last_build_date
+        )
+
+    def test__enrich_enclosures__probes_once(self):
+        prober = FakeProber()
+        enrich_enclosures(prober)
+        # The same file in a new episode is filled in from the cache.
+        session.execute(episodes_table.insert(), {
+            'id': 4, 'feed_name': 'feed', 'key': 'again', 'duration': '',
+            'published': datetime(2021, 1, 1),
+        })
+        session.execute(enclosure_table.insert(), {
+            'episode_id': 4, 'url': 'a.mp3', 'length': '',
+        })
+        session.commit()
+        enrich_enclosures(prober)
+        self.assertEqual(len(prober.probed), 2)
+        self.assertEqual(
+            self.stored()[:2], [('a.mp3', '1000', '1:30')] * 2,
+        )
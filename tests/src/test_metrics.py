@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from src.metrics import Registry
+
+
+class RegistryTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.registry = Registry()
+
+    def test__counter(self):
+        counter = self.registry.counter(
+            'fetches_total', 'Fetches.', ('source', 'status'),
+        )
+        counter.inc(source='http://a/"rss"', status=200)
+        counter.inc(2, source='http://a/"rss"', status=200)
+        counter.inc(source='http://b/', status=304)
+        self.assertEqual(
+            '# HELP fetches_total Fetches.\n'
+            '# TYPE fetches_total counter\n'
+            'fetches_total{source="http://a/\\"rss\\"",status="200"} 3\n'
+            'fetches_total{source="http://b/",status="304"} 1\n',
+            self.registry.render(),
+        )
+
+    def test__histogram(self):
+        histogram = self.registry.histogram(
+            'seconds', 'Duration.', buckets=(0.1, 1),
+        )
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+        self.assertEqual(
+            '# HELP seconds Duration.\n'
+            '# TYPE seconds histogram\n'
+            'seconds_bucket{le="0.1"} 2\n'
+            'seconds_bucket{le="1"} 3\n'
+            'seconds_bucket{le="+Inf"} 4\n'
+            'seconds_sum 2.65\n'
+            'seconds_count 4\n',
+            self.registry.render(),
+        )
+
+    def test__function(self):
+        self.registry.gauge('size', 'Size.', function=lambda: 42)
+        self.assertIn('\nsize 42\n', self.registry.render())
+
+    def test__register_twice(self):
+        first = self.registry.counter('total', 'Total.')
+        self.assertIs(first, self.registry.counter('total', 'Total.'))
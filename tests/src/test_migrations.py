@@ -0,0 +1,192 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine, inspect, text
+
+from src import migrations, queries, storage
+from src.container import Feed
+from src.parser import episode_key
+from src.storage import metadata, session
+from src.updater import insert_episodes, new_episodes_list
+
+
+# The tables as the first release created them.
+BASELINE_SCHEMA = (
+    'CREATE TABLE feeds (name VARCHAR NOT NULL, title VARCHAR, '
+    'link VARCHAR, language VARCHAR, description VARCHAR, image VARCHAR, '
+    'last_build_date DATETIME, PRIMARY KEY (name))',
+    'CREATE TABLE sources (id INTEGER NOT NULL, feed_name VARCHAR, '
+    'url VARCHAR, PRIMARY KEY (id), '
+    'FOREIGN KEY(feed_name) REFERENCES feeds (name))',
+    'CREATE TABLE episodes (id INTEGER NOT NULL, feed_name VARCHAR, '
+    'title VARCHAR, link VARCHAR, published DATETIME, '
+    'description VARCHAR, duration VARCHAR, image VARCHAR, '
+    'author VARCHAR, PRIMARY KEY (id), '
+    'FOREIGN KEY(feed_name) REFERENCES feeds (name))',
+    'CREATE TABLE enclosure (id INTEGER NOT NULL, episode_id INTEGER, '
+    'length VARCHAR, type VARCHAR, url VARCHAR, PRIMARY KEY (id), '
+    'FOREIGN KEY(episode_id) REFERENCES episodes (id))',
+)
+
+
+class MigrateTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_engine('sqlite://')
+
+    def version(self):
+        with self.engine.connect() as connection:
+            return migrations.current_version(connection)
+
+    def test__new_database(self):
+        migrations.migrate(self.engine)
+        self.assertTrue(
+            set(metadata.tables) <= set(inspect(self.engine).get_table_names())
+        )
+        self.assertEqual(migrations.head(), self.version())
+
+    def test__idempotent(self):
+        migrations.migrate(self.engine)
+        migrations.migrate(self.engine)
+        self.assertEqual(migrations.head(), self.version())
+
+    def test__unversioned_database(self):
+        metadata.create_all(self.engine)
+        migration = MagicMock()
+        with patch.object(migrations, 'MIGRATIONS', [migration]):
+            migrations.migrate(self.engine)
+            self.assertEqual(2, self.version())
+        migration.assert_called_once()
+
+    def test__runs_pending_migrations_in_order(self):
+        with patch.object(migrations, 'MIGRATIONS', []):
+            migrations.migrate(self.engine)
+        calls = []
+        pending = [
+            lambda connection: calls.append(2),
+            lambda connection: calls.append(3),
+        ]
+        with patch.object(migrations, 'MIGRATIONS', pending):
+            migrations.migrate(self.engine)
+            migrations.migrate(self.engine)
+        self.assertEqual([2, 3], calls)
+        self.assertEqual(3, self.version())
+
+    def test__baseline_database(self):
+        with self.engine.begin() as connection:
+            for statement in BASELINE_SCHEMA:
+                connection.execute(text(statement))
+            connection.execute(text(
+                "INSERT INTO feeds (name, title) VALUES ('feed', 'Feed')"
+            ))
+            connection.execute(text(
+                "INSERT INTO sources (feed_name, url) VALUES ('feed', 'u')"
+            ))
+            # The first release could store the same episode twice.
+            for id_ in (1, 2, 3):
+                connection.execute(
+                    text(
+                        'INSERT INTO episodes '
+                        '(id, feed_name, title, link, published) '
+                        "VALUES (:id, 'feed', 'Title', :link, :published)"
+                    ),
+                    {
+                        'id': id_, 'link': 'same' if id_ < 3 else 'other',
+                        'published': '2021-01-0%d 00:00:00.000000' % id_,
+                    },
+                )
+        migrations.migrate(self.engine)
+        self.assertEqual(migrations.head(), self.version())
+        columns = {
+            table: {
+                column['name']
+                for column in inspect(self.engine).get_columns(table)
+            } for table in metadata.tables
+        }
+        for table in metadata.tables.values():
+            self.assertEqual(
+                {column.name for column in table.columns},
+                columns[table.name],
+            )
+        with self.engine.connect() as connection:
+            keys = connection.execute(
+                text('SELECT key FROM episodes ORDER BY id'),
+            ).scalars().all()
+            self.assertEqual(3, len(set(keys)))
+            self.assertNotIn('', keys)
+            feed = queries.load_feed(connection, 'feed')
+            self.assertEqual(100, feed.max_items)
+            self.assertEqual(
+                3, len(queries.load_episodes(connection, 'feed', 10)),
+            )
+        self.assertIn(
+            'ix_episodes_feed_name_key',
+            [
+                index['name']
+                for index in inspect(self.engine).get_indexes('episodes')
+            ],
+        )
+
+    def test__baseline_episodes_updated_once(self):
+        with self.engine.begin() as connection:
+            for statement in BASELINE_SCHEMA:
+                connection.execute(text(statement))
+            connection.execute(text(
+                "INSERT INTO feeds (name, title) VALUES ('feed', 'Feed')"
+            ))
+            connection.execute(text(
+                'INSERT INTO episodes (id, feed_name, title, link) '
+                "VALUES (1, 'feed', 'Title 1', 'https://e.com/1')"
+            ))
+            connection.execute(text(
+                'INSERT INTO enclosure (episode_id, url) '
+                "VALUES (1, 'https://e.com/1.mp3')"
+            ))
+        migrations.migrate(self.engine)
+        rss = (
+            '<rss><channel><title>Feed</title>' + ''.join(
+                f'<item><title>Title {number}</title>'
+                f'<guid>guid-{number}</guid>'
+                f'<link>https://e.com/{number}</link>'
+                f'<enclosure url="https://e.com/{number}.mp3"/></item>'
+                for number in (2, 1)
+            ) + '</channel></rss>'
+        ).encode('utf-8')
+        session.remove()
+        session.configure(bind=self.engine)
+        try:
+            for _ in range(2):
+                feed = session.get(Feed, 'feed')
+                episodes = new_episodes_list(feed, rss)
+                for episode in episodes:
+                    episode.update(feed_name='feed', source_id=None)
+                insert_episodes(episodes)
+                session.commit()
+            keys = session.execute(
+                text('SELECT title, key FROM episodes ORDER BY id'),
+            ).all()
+        finally:
+            session.remove()
+            session.configure(bind=storage.engine)
+        self.assertEqual(
+            [
+                ('Title 1', episode_key({'guid': 'guid-1'})),
+                ('Title 2', episode_key({'guid': 'guid-2'})),
+            ],
+            keys,
+        )
+
+    def test__add_episode_indexes(self):
+        metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.execute(
+                text('DROP INDEX ix_episodes_feed_name_published'),
+            )
+        migrations.migrate(self.engine)
+        self.assertIn(
+            'ix_episodes_feed_name_published',
+            [
+                index['name']
+                for index in inspect(self.engine).get_indexes('episodes')
+            ],
+        )
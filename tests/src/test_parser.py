@@ -1,15 +1,16 @@
+import io
 from pathlib import Path
 from unittest import TestCase
 
 from lxml import etree
 
 import src.parser as parser
-from src.parser import get_episodes, logger
+from src.parser import ChannelContext, episode_key, get_episodes, logger
 
 
 with open(Path(__file__).parent.joinpath('correct_rss.xml').resolve()) as file:
     CORRECT_RSS = file.read()
-ITEM_EMPTY_TAGS = etree.XML('<item></item>')
+ITEM_EMPTY_TAGS = parser._children(etree.XML('<item></item>'))
 
 
 class GetEpisodesTestCase(TestCase):
@@ -18,6 +19,7 @@ class GetEpisodesTestCase(TestCase):
         self.correct_parsed_episodes_list = [
             {
                 'title': 'Title 1',
+                'guid': 'https://example.com/1.mp3',
                 'enclosure': {
                     'length': '26229027',
                     'type': 'audio/mpeg',
@@ -58,7 +60,9 @@ class GetEpisodesTestCase(TestCase):
         for item in item_empty_link_tag.iter('item'):
             self.assertEqual(
                 'https://example.com',
-                parser._parse_link(item),
+                parser._parse_link(
+                    parser._children(item), ChannelContext.from_item(item),
+                ),
             )
 
     def test__parse_published__empty_tag__empty_str(self):
@@ -92,9 +96,107 @@ class GetEpisodesTestCase(TestCase):
             '<channel><itunes:image href="another image"/><item></item>'
             '</channel></rss>'
         )
+        for rss, image in (
+                (image_tag_in_header, 'some image'),
+                (itunes_image_tag_in_header, 'another image'),
+        ):
+            item = rss.find('channel/item')
+            self.assertEqual(
+                image,
+                parser._parse_image(
+                    parser._children(item), ChannelContext.from_item(item),
+                ),
+            )
+
+    def test__parse_author(self):
+        rss = etree.XML(
+            '<rss><channel><item><author>Item author</author></item>'
+            '<item></item></channel></rss>'
+        )
+        context = ChannelContext.from_channel(rss.find('channel'))
+        self.assertEqual(
+            ['Item author', ''],
+            [
+                parser._parse_author(parser._children(item), context)
+                for item in rss.iter('item')
+            ],
+        )
+
+    def test__channel_with_repeated_elements(self):
+        itunes = parser.namespaces['itunes']
+        rss = etree.XML(
+            f'<rss xmlns:itunes="{itunes}"><channel>'
+            '<link>https://a.com</link><link>https://b.com</link>'
+            '<itunes:author>A</itunes:author><itunes:author>B</itunes:author>'
+            '<itunes:image href="a.jpg"/><itunes:image href="b.jpg"/>'
+            '</channel></rss>'
+        )
+        context = ChannelContext.from_channel(rss.find('channel'))
+        self.assertEqual(
+            ('https://a.com', 'a.jpg', 'A'),
+            (context.link, context.image, context.author),
+        )
+
+    def test__bytes_and_stream(self):
+        rss_bytes = CORRECT_RSS.encode('utf-8')
         self.assertEqual(
-            parser._parse_image(image_tag_in_header), 'some image',
+            self.correct_parsed_episodes_list, list(get_episodes(rss_bytes)),
         )
         self.assertEqual(
-            parser._parse_image(itunes_image_tag_in_header), 'another image',
+            self.correct_parsed_episodes_list,
+            list(get_episodes(io.BytesIO(rss_bytes))),
+        )
+
+    def test__stops_at_known_episode(self):
+        rss = (
+            '<rss><channel><link>https://example.com</link>'
+            '<item><guid>3</guid><author>a</author></item>'
+            '<item><guid>2</guid><author>a</author></item>'
+            '<item><guid>1</guid><author>a</author></item>'
+            '</channel></rss>'
+        )
+        known = {episode_key({'guid': '2'})}
+        episodes = get_episodes(rss, is_known=lambda key: key in known)
+        self.assertEqual(['3'], [episode['guid'] for episode in episodes])
+
+    def test__on_channel__refresh_hint(self):
+        sy = parser.namespaces['sy']
+        channels = {
+            '<ttl>30</ttl>': 30 * 60,
+            f'<sy:updatePeriod xmlns:sy="{sy}">daily</sy:updatePeriod>': (
+                24 * 60 * 60
+            ),
+            (
+                f'<sy:updatePeriod xmlns:sy="{sy}">hourly</sy:updatePeriod>'
+                f'<sy:updateFrequency xmlns:sy="{sy}">2</sy:updateFrequency>'
+            ): 30 * 60,
+            '<ttl>none</ttl>': None,
+        }
+        for channel, ttl in channels.items():
+            contexts = []
+            list(get_episodes(
+                f'<rss><channel>{channel}<item/></channel></rss>',
+                on_channel=contexts.append,
+            ))
+            self.assertEqual([ttl], [context.ttl for context in contexts])
+
+
+class EpisodeKeyTestCase(TestCase):
+
+    def test__guid(self):
+        self.assertEqual(
+            episode_key({'guid': 'guid', 'link': 'link 1'}),
+            episode_key({'guid': 'guid', 'link': 'link 2'}),
+        )
+
+    def test__no_guid__enclosure_url_and_link(self):
+        episode = {
+            'guid': '',
+            'enclosure': {'url': 'https://example.com/1.mp3'},
+            'link': 'https://example.com/episode',
+        }
+        self.assertEqual(40, len(episode_key(episode)))
+        self.assertNotEqual(
+            episode_key(episode),
+            episode_key({**episode, 'link': 'https://example.com/other'}),
         )
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.container import Source
+from src.polling import is_due, publish_interval, PollingPolicy
+
+
+DAY = 24 * 60 * 60
+NOW = datetime(2021, 1, 10, 12)
+
+
+def make_source(**attributes):
+    source = Source('http://example.com/rss')
+    for name, value in attributes.items():
+        setattr(source, name, value)
+    return source
+
+
+class PublishIntervalTestCase(TestCase):
+
+    def test__median(self):
+        published = [datetime(2021, 1, day) for day in (1, 2, 3, 10)]
+        self.assertEqual(DAY, publish_interval(reversed(published)))
+
+    def test__not_enough_history(self):
+        self.assertIsNone(publish_interval([datetime(2021, 1, 1), None]))
+        self.assertIsNone(publish_interval([NOW, NOW]))
+
+
+class PollingPolicyTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.policy = PollingPolicy(
+            min_interval=60, max_interval=DAY, jitter=0,
+        )
+
+    def daily(self, published_ago: float, **attributes):
+        return make_source(
+            publish_interval=DAY,
+            published_at=NOW - timedelta(seconds=published_ago),
+            **attributes,
+        )
+
+    def test__cadence_interval(self):
+        self.assertEqual(
+            60, self.policy.cadence_interval(make_source(), NOW),
+        )
+        self.assertEqual(
+            DAY / 24,
+            self.policy.cadence_interval(
+                make_source(publish_interval=DAY), NOW,
+            ),
+        )
+        self.assertEqual(
+            DAY - DAY / 8 - 60 * 60,
+            self.policy.cadence_interval(self.daily(60 * 60), NOW),
+        )
+        self.assertEqual(
+            DAY / 96, self.policy.cadence_interval(self.daily(DAY), NOW),
+        )
+        self.assertEqual(
+            DAY / 24, self.policy.cadence_interval(self.daily(2 * DAY), NOW),
+        )
+
+    def test__interval__hints(self):
+        source = self.daily(DAY, ttl=60 * 60)
+        self.assertEqual(60 * 60, self.policy.interval(source, NOW))
+        self.assertEqual(
+            2 * 60 * 60,
+            self.policy.interval(source, NOW, max_age=2 * 60 * 60),
+        )
+        self.assertEqual(
+            DAY, self.policy.interval(source, NOW, max_age=2 * DAY),
+        )
+
+    def test__interval__backoff(self):
+        intervals = [
+            self.policy.interval(make_source(error_count=count), NOW)
+            for count in (1, 2, 3, 100)
+        ]
+        self.assertEqual([120, 240, 480, DAY], intervals)
+        self.assertEqual(
+            2 * DAY,
+            self.policy.interval(
+                make_source(error_count=1), NOW, retry_after=2 * DAY,
+            ),
+        )
+
+    def test__interval__jitter(self):
+        policy = PollingPolicy(min_interval=100, jitter=0.1)
+        with patch('random.uniform', return_value=1.1) as uniform:
+            self.assertAlmostEqual(
+                110, policy.interval(make_source(), NOW),
+            )
+        uniform.assert_called_once_with(0.9, 1.1)
+
+    def test__schedule(self):
+        source = make_source(error_count=2)
+        self.policy.schedule(source, NOW, failed=False)
+        self.assertEqual(0, source.error_count)
+        self.assertEqual(NOW + timedelta(seconds=60), source.next_poll_at)
+        self.assertFalse(is_due(source, NOW))
+        self.assertTrue(is_due(source, source.next_poll_at))
+        self.policy.schedule(source, NOW, failed=True)
+        self.assertEqual(1, source.error_count)
+        self.assertEqual(NOW + timedelta(seconds=120), source.next_poll_at)
+
+    def test__from_settings(self):
+        policy = PollingPolicy.from_settings({'timeout': '30'})
+        self.assertEqual((30, 6 * 60 * 60), (
+            policy.min_interval, policy.max_interval,
+        ))
+        policy = PollingPolicy.from_settings(
+            {'timeout': '30', 'min_poll_interval': '600',
+             'max_poll_interval': '300'},
+        )
+        self.assertEqual((600, 600), (
+            policy.min_interval, policy.max_interval,
+        ))
@@ -0,0 +1,56 @@
+import pstats
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.profiling import Profiler
+
+
+class ProfilerTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.profiler = Profiler(self.directory.name, rate=1, max_files=2)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def files(self) -> list[Path]:
+        return sorted(Path(self.directory.name).glob('*.prof'))
+
+    def test__disabled(self):
+        self.profiler.rate = 0
+        self.assertEqual(2, self.profiler.profiled('add')(lambda: 2)())
+        self.assertEqual([], self.files())
+
+    def test__profiled(self):
+        def inner():
+            return sum(range(100))
+
+        @self.profiler.profiled('outer')
+        def outer():
+            return self.profiler.profiled('inner')(inner)()
+
+        with self.assertLogs('src.profiling'):
+            self.assertEqual(4950, outer())
+        files = self.files()
+        self.assertEqual(1, len(files))
+        self.assertTrue(files[0].name.startswith('outer-'))
+        functions = {
+            function for _, _, function in pstats.Stats(str(files[0])).stats
+        }
+        self.assertIn('inner', functions)
+
+    def test__rate__shared(self):
+        other = Profiler(self.directory.name)
+        self.assertEqual(0, other.rate)
+        self.profiler.rate = 0.5
+        self.assertEqual(0.5, other.rate)
+        self.assertEqual([], self.files())
+
+    def test__max_files(self):
+        function = self.profiler.profiled('call')(lambda: None)
+        with self.assertLogs('src.profiling'):
+            for _ in range(4):
+                function()
+        self.assertEqual(2, len(self.files()))
@@ -0,0 +1,82 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src import queries
+from src.migrations import migrate
+from src.storage import create_db_engine, enclosure_table, episodes_table, \
+    feeds_table
+
+
+class QueriesTestCase(TestCase):
+
+    def setUp(self) -> None:
+        engine = create_db_engine('sqlite://')
+        migrate(engine)
+        self.session = Session(engine)
+        self.session.execute(
+            feeds_table.insert(), {'name': 'feed', 'title': 'Feed'},
+        )
+        for number in range(1, 6):
+            self.session.execute(
+                episodes_table.insert(),
+                {
+                    'id': number,
+                    'feed_name': 'feed',
+                    'title': f'Title {number}',
+                    'description': f'<p>Description {number}</p>',
+                    'author': ''.join(('Aut', 'hor')),
+                    'published': datetime(2021, 1, number),
+                    'key': str(number),
+                },
+            )
+            self.session.execute(
+                enclosure_table.insert(),
+                {'episode_id': number, 'url': f'https://e.com/{number}.mp3'},
+            )
+
+    def tearDown(self) -> None:
+        self.session.close()
+
+    def test__load_feed(self):
+        self.assertEqual('Feed', queries.load_feed(self.session, 'feed').title)
+        self.assertIsNone(queries.load_feed(self.session, 'other'))
+
+    def test__count_episodes(self):
+        self.assertEqual(5, queries.count_episodes(self.session, 'feed'))
+        self.assertEqual(0, queries.count_episodes(self.session, 'other'))
+
+    def test__load_episodes__page(self):
+        episodes = queries.load_episodes(self.session, 'feed', 2, 2)
+        self.assertEqual(
+            ['Title 3', 'Title 2'], [episode.title for episode in episodes],
+        )
+        self.assertEqual(
+            'https://e.com/3.mp3', episodes[0].enclosure.url,
+        )
+
+    def test__load_episodes__compact(self):
+        statements = []
+        event.listen(
+            self.session.get_bind(), 'before_cursor_execute',
+            lambda *args: statements.append(args[2]),
+        )
+        first, second = queries.load_episodes(self.session, 'feed', 2)
+        self.assertIs(first.author, second.author)
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertEqual('<p>Description 5</p>', first.description)
+        self.assertEqual('<p>Description 4</p>', second.description)
+        self.assertEqual(1, len(statements))
+
+    def test__iter_episodes(self):
+        self.assertEqual(
+            queries.load_episodes(self.session, 'feed', 10),
+            list(queries.iter_episodes(self.session, 'feed', 10)),
+        )
+
+    def test__last_page(self):
+        self.assertEqual(
+            [1, 1, 1, 2], [queries.last_page(n, 2) for n in (0, 1, 2, 3)],
+        )
@@ -1,8 +1,13 @@
 from datetime import datetime, timezone
 from unittest import TestCase
+from unittest.mock import patch
+
+from lxml import etree
 
 from src.container import Enclosure, Episode, Feed, Source
-from src.rss_builder import create_rss
+from src.parser import namespaces
+from src.queries import EnclosureView, EpisodeView
+from src.rss_builder import create_rss, iter_rss
 
 
 class CreateRssTestCase(TestCase):
@@ -59,3 +64,118 @@ class CreateRssTestCase(TestCase):
         )
         url_for_feed_image = 'http://image.jpg'
         self.assertEqual(expected_string, create_rss(feed, url_for_feed_image))
+
+    def test__iter_rss__chunks(self):
+        feed = Feed(
+            name='Feed name',
+            title='Feed title',
+            link=None,
+            language='ru',
+            description='feed description',
+            image='Feed image',
+            last_build_date=datetime(
+                2022, 12, 24, 22, 58, 27, tzinfo=timezone.utc
+            ),
+        )
+        episodes = [
+            Episode(
+                title=f'Title {number} & <more>',
+                enclosure=Enclosure(
+                    length='1', type='audio/mpeg', url='https://e.com/1.mp3',
+                ),
+                link=f'https://e.com/{number}',
+                published=datetime(2022, 12, number, tzinfo=timezone.utc),
+                description='<p>Item description</p>',
+                duration='' if number % 3 else '27:20',
+                image='https://e.com/image.jpg',
+                author='Author',
+            ) for number in range(1, 8)
+        ]
+        with patch('src.rss_builder.CHUNK_ITEMS', 3):
+            chunks = list(iter_rss(feed, 'http://image.jpg', episodes))
+        self.assertEqual(3, len(chunks))
+        self.assertEqual(
+            etree.tostring(
+                etree.XML(b''.join(chunks)), xml_declaration=True,
+                encoding='utf-8', method='xml', pretty_print=True,
+            ),
+            b''.join(chunks),
+        )
+
+    def test__paged(self):
+        feed = Feed(
+            name='Feed name',
+            title='Feed title',
+            link='Feed link',
+            language='ru',
+            description='feed description',
+            image='Feed image',
+            last_build_date=datetime(
+                2022, 12, 24, 22, 58, 27, tzinfo=timezone.utc
+            ),
+        )
+        rss = etree.XML(
+            create_rss(
+                feed, 'http://image.jpg', episodes=[],
+                links={'next': 'http://rss?page=2'},
+            )
+        )
+        self.assertEqual([], rss.findall('channel/item'))
+        self.assertEqual(
+            [{'rel': 'next', 'href': 'http://rss?page=2'}],
+            [
+                dict(link.attrib) for link in rss.iterfind(
+                    'channel/atom:link', namespaces,
+                )
+            ],
+        )
+
+    def test__item_without_enclosure_or_date(self):
+        feed = Feed(
+            name='Feed name',
+            title='Feed title',
+            link='Feed link',
+            language='ru',
+            description='feed description',
+            image='Feed image',
+        )
+        episodes = [
+            Episode(
+                title='No enclosure',
+                enclosure=None,
+                link=None,
+                published=None,
+                description=None,
+                duration='',
+                image='',
+                author=None,
+            ),
+            # The outer join of the read queries gives an empty enclosure.
+            EpisodeView(
+                2, 'Empty enclosure', EnclosureView(None, None, None), None,
+                None, None, '', None, None,
+            ),
+            Episode(
+                title='No length',
+                enclosure=Enclosure(
+                    length=None, type=None, url='https://e.com/1.mp3',
+                ),
+                link='https://e.com/1',
+                published=datetime(2022, 12, 1, tzinfo=timezone.utc),
+                description='',
+                duration='',
+                image='https://e.com/image.jpg',
+                author='Author',
+            ),
+        ]
+        items = etree.XML(
+            create_rss(feed, 'http://image.jpg', episodes),
+        ).findall('channel/item')
+        self.assertEqual(3, len(items))
+        self.assertIsNone(items[0].find('enclosure'))
+        self.assertIsNone(items[0].find('pubDate'))
+        self.assertIsNone(items[1].find('enclosure'))
+        self.assertEqual(
+            {'url': 'https://e.com/1.mp3'},
+            dict(items[2].find('enclosure').attrib),
+        )
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+import gzip
+from unittest import TestCase
+
+import brotli
+from werkzeug.datastructures import Accept
+
+from src.rss_cache import CachedRss, RssCache
+
+
+ENTRY_SIZE = CachedRss(b'1234', '').size
+
+
+class RssCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.cache = RssCache(max_bytes=ENTRY_SIZE * 2 + 1)
+
+    def test__get__hit_and_miss(self):
+        self.assertIsNone(self.cache.get('feed', 'http://a/'))
+        self.cache.put('feed', 'http://a/', 'http://a/image', b'1234')
+        self.assertEqual(b'1234', self.cache.get('feed', 'http://a/').body)
+        self.assertIsNone(self.cache.get('feed', 'http://b/'))
+        stats = self.cache.stats()
+        self.assertEqual((1, 2), (stats['hits'], stats['misses']))
+
+    def test__put__evicts_least_recently_used(self):
+        self.cache.put('feed1', 'http://a/', '', b'1234')
+        self.cache.put('feed2', 'http://a/', '', b'1234')
+        self.cache.get('feed1', 'http://a/')
+        self.cache.put('feed3', 'http://a/', '', b'1234')
+        self.assertIsNotNone(self.cache.get('feed1', 'http://a/'))
+        self.assertIsNone(self.cache.get('feed2', 'http://a/'))
+        self.assertEqual(ENTRY_SIZE * 2, self.cache.stats()['size'])
+        self.assertEqual(1, self.cache.stats()['evictions'])
+
+    def test__put__too_large(self):
+        with self.assertLogs('src.rss_cache'):
+            self.cache.put('feed', 'http://a/', '', b'1234' * ENTRY_SIZE)
+        self.assertEqual(0, self.cache.stats()['entries'])
+
+    def test__get__stale(self):
+        updated = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        self.cache.put('feed', 'http://a/', '', b'1', updated)
+        self.assertIsNotNone(self.cache.get('feed', 'http://a/', 1, updated))
+        self.assertIsNone(
+            self.cache.get('feed', 'http://a/', 1, datetime.now(timezone.utc))
+        )
+        self.assertEqual(0, self.cache.stats()['entries'])
+        self.assertEqual(1, self.cache.stats()['stale'])
+
+    def test__tee(self):
+        chunks = self.cache.tee('feed', 'http://a/', '', iter([b'12', b'34']))
+        self.assertIsNone(self.cache.get('feed', 'http://a/'))
+        self.assertEqual([b'12', b'34'], list(chunks))
+        self.assertEqual(b'1234', self.cache.get('feed', 'http://a/').body)
+
+    def test__tee__too_large(self):
+        chunks = [b'1234'] * ENTRY_SIZE
+        self.assertEqual(
+            chunks, list(self.cache.tee('feed', 'http://a/', '', chunks)),
+        )
+        self.assertIsNone(self.cache.get('feed', 'http://a/'))
+
+    def test__invalidate(self):
+        self.cache.put('feed', 'http://a/', '', b'1')
+        self.cache.put('feed', 'http://b/', '', b'1')
+        self.cache.invalidate('feed')
+        self.assertEqual(
+            {'entries': 0, 'size': 0},
+            {
+                key: value for key, value in self.cache.stats().items()
+                if key in ('entries', 'size')
+            },
+        )
+
+
+class CachedRssTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.entry = CachedRss(b'<rss/>' * 100, '')
+
+    def test__etag(self):
+        self.assertEqual(self.entry.etag, CachedRss(self.entry.body, '').etag)
+        self.assertNotEqual(self.entry.etag, CachedRss(b'<rss/>', '').etag)
+
+    def test__gzip(self):
+        self.assertEqual(
+            self.entry.body, gzip.decompress(self.entry.encode('gzip')),
+        )
+
+    def test__brotli(self):
+        self.assertEqual(
+            self.entry.body, brotli.decompress(self.entry.encode('br')),
+        )
+
+    def test__negotiate(self):
+        self.assertEqual(
+            'gzip', self.entry.negotiate(Accept([('gzip', 1)])),
+        )
+        self.assertEqual(
+            'br', self.entry.negotiate(Accept([('gzip', 1), ('br', 1)])),
+        )
+        self.assertEqual(
+            'gzip',
+            self.entry.negotiate(Accept([('gzip', 1), ('br', 0.5)])),
+        )
+        self.assertIsNone(self.entry.negotiate(Accept([('gzip', 0)])))
+        self.assertIsNone(self.entry.negotiate(Accept([])))
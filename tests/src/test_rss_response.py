@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+import gzip
+from unittest import TestCase
+
+from flask import Flask, url_for
+
+from src.rss_cache import CachedRss
+from src.rss_response import cached_response, feed_image_url
+
+
+class FeedImageUrlTestCase(TestCase):
+
+    def test__feed_image_url__quoted_like_url_for(self):
+        app = Flask(__name__)
+        app.add_url_rule('/image/<filename>', 'image_folder')
+        image = 'cover art #1?.jpg'
+        with app.test_request_context(base_url='http://a/'):
+            self.assertEqual(
+                f"http://a{url_for('image_folder', filename=image)}",
+                feed_image_url('http://a/', image),
+            )
+
+
+class CachedResponseTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.entry = CachedRss(
+            b'<rss/>', '', datetime(2021, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def test__cached_response__gzip(self):
+        status, headers, body = cached_response(
+            self.entry, {'accept-encoding': 'gzip'},
+        )
+        headers = dict(headers)
+        self.assertEqual(200, status)
+        self.assertEqual(b'<rss/>', gzip.decompress(body))
+        self.assertEqual('gzip', headers['Content-Encoding'])
+        self.assertEqual(f'"{self.entry.etag}-gzip"', headers['ETag'])
+        self.assertEqual(str(len(body)), headers['Content-Length'])
+
+    def test__cached_response__not_modified(self):
+        status, headers, body = cached_response(
+            self.entry, {'if-none-match': f'"{self.entry.etag}"'},
+        )
+        self.assertEqual((304, b''), (status, body))
+        self.assertEqual(
+            'Fri, 01 Jan 2021 00:00:00 GMT', dict(headers)['Last-Modified'],
+        )
@@ -0,0 +1,112 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src import migrations
+from src.migrations import migrate
+from src.search import match_expression, search_episodes, terms
+from src.storage import create_db_engine, enclosure_table, episodes_table, \
+    feeds_table, metadata
+
+
+EPISODES = (
+    ('news', 'Morning news', 'Weather and traffic', 'Anna', 1),
+    ('news', 'Evening news', 'Sports results', 'Boris', 2),
+    ('music', 'Jazz hour', 'New releases of the week', 'Anna', 3),
+    ('music', 'Новости джаза', 'Обзор недели', 'Вера', 4),
+)
+
+
+class SearchEpisodesTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_db_engine('sqlite://')
+        migrate(self.engine)
+        self.session = Session(self.engine)
+        for name in ('news', 'music'):
+            self.session.execute(feeds_table.insert(), {'name': name})
+        for number, (feed_name, title, description, author, day) in \
+                enumerate(EPISODES, 1):
+            self.session.execute(episodes_table.insert(), {
+                'id': number, 'feed_name': feed_name, 'title': title,
+                'description': description, 'author': author,
+                'published': datetime(2021, 1, day), 'key': str(number),
+            })
+            self.session.execute(enclosure_table.insert(), {
+                'episode_id': number, 'url': f'{number}.mp3',
+            })
+
+    def tearDown(self) -> None:
+        self.session.close()
+
+    def titles(self, query, **kwargs):
+        return [
+            hit.episode.title
+            for hit in search_episodes(self.session, query, **kwargs)
+        ]
+
+    def test__terms(self):
+        self.assertEqual(terms('"news" OR -jazz*'), ['news', 'OR', 'jazz'])
+        self.assertEqual(
+            match_expression(['news', 'OR']), '"news" "OR"*',
+        )
+
+    def test__search_episodes(self):
+        self.assertEqual(
+            self.titles('news', order='date'),
+            ['Evening news', 'Morning news'],
+        )
+        self.assertEqual(self.titles('anna week'), ['Jazz hour'])
+        self.assertEqual(self.titles('traf'), ['Morning news'])
+        self.assertEqual(self.titles('НОВОСТИ'), ['Новости джаза'])
+        self.assertEqual(self.titles('"'), [])
+        hit = search_episodes(self.session, 'jazz hour')[0]
+        self.assertEqual(hit.feed_name, 'music')
+        self.assertEqual(hit.episode.enclosure.url, '3.mp3')
+
+    def test__search_episodes__filters(self):
+        self.assertEqual(self.titles('anna', feed_name='news'), [
+            'Morning news',
+        ])
+        self.assertEqual(
+            self.titles(
+                'news', since=datetime(2021, 1, 2),
+                until=datetime(2021, 1, 3),
+            ),
+            ['Evening news'],
+        )
+        self.assertEqual(
+            self.titles('news', order='date', limit=1, offset=1),
+            ['Morning news'],
+        )
+
+    def test__index_follows_changes(self):
+        self.session.execute(
+            episodes_table.update().where(episodes_table.c.id == 1)
+            .values(title='Morning show')
+        )
+        self.session.execute(
+            episodes_table.delete().where(episodes_table.c.id == 2)
+        )
+        self.assertEqual(self.titles('news'), [])
+        self.assertEqual(self.titles('show'), ['Morning show'])
+
+
+class AddEpisodeSearchTestCase(TestCase):
+
+    def test__indexes_stored_episodes(self):
+        engine = create_db_engine('sqlite://')
+        metadata.create_all(engine)
+        with engine.begin() as connection:
+            for name in ('fts_insert', 'fts_delete', 'fts_update'):
+                connection.execute(text(f'DROP TRIGGER episodes_{name}'))
+            connection.execute(text('DROP TABLE episodes_fts'))
+            connection.execute(feeds_table.insert(), {'name': 'news'})
+            connection.execute(episodes_table.insert(), {
+                'feed_name': 'news', 'title': 'Morning news', 'key': '1',
+            })
+            migrations._add_episode_search(connection)
+        with Session(engine) as session:
+            self.assertEqual(len(search_episodes(session, 'morning')), 1)
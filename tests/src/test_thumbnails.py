@@ -0,0 +1,74 @@
+import io
+from pathlib import Path
+import tempfile
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+
+from src import thumbnails
+from src.thumbnails import Image, ThumbnailCache
+
+
+def make_png(width, height):
+    output = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 100, 0, 255)).save(
+        output, 'PNG',
+    )
+    return output.getvalue()
+
+
+@skipIf(Image is None, 'Pillow is not installed')
+class ThumbnailCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        root = Path(self.directory.name)
+        (root / 'image').mkdir()
+        (root / 'image' / 'cover.png').write_bytes(make_png(1200, 800))
+        (root / 'image' / 'copy.png').write_bytes(make_png(1200, 800))
+        self.cache = ThumbnailCache(
+            str(root / 'thumbnails'), str(root / 'image'),
+        )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test__get(self):
+        path, etag = self.cache.get('cover.png', 300)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (300, 200))
+            self.assertEqual(image.format, 'JPEG')
+        self.assertTrue(etag.endswith('-300'))
+        self.assertEqual(self.cache.get('cover.png', 300), (path, etag))
+
+    def test__get__same_content_same_thumbnail(self):
+        self.assertEqual(
+            self.cache.get('cover.png', 96), self.cache.get('copy.png', 96),
+        )
+
+    def test__get__missing(self):
+        self.assertIsNone(self.cache.get('missing.png', 96))
+        self.assertIsNone(self.cache.get('../secret', 96))
+
+    def test__get__too_many_pixels(self):
+        with patch.object(thumbnails, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertIsNone(self.cache.get('cover.png', 96))
+        # Pillow refuses images of more than twice its own limit.
+        with patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            self.assertIsNone(self.cache.get('copy.png', 96))
+
+    def test__get__evicts_oldest(self):
+        self.cache.max_bytes = 1
+        first, _ = self.cache.get('cover.png', 96)
+        second, _ = self.cache.get('cover.png', 600)
+        self.assertFalse(first.exists())
+        self.assertTrue(second.exists())
+
+    def test__verify(self):
+        signature = self.cache.sign('cover.png', 300)
+        self.assertTrue(self.cache.verify('cover.png', 300, signature))
+        self.assertFalse(self.cache.verify('copy.png', 300, signature))
+        self.assertFalse(self.cache.verify('cover.png', 301, signature))
+        self.assertEqual(
+            ThumbnailCache(self.cache.directory).sign('cover.png', 300),
+            signature,
+        )
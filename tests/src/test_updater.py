@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import event, select
+
+from src import storage
+from src.container import Feed, Source
+from src.fetcher import FetchResult
+from src.migrations import migrate
+from src.storage import create_db_engine, enclosure_table, \
+    episodes_table, session
+from src.parser import episode_key
+from src.updater import check_source, insert_episodes, merge_episodes, \
+    new_episodes_list
+
+
+def make_episode(key, enclosure=True):
+    return {
+        'title': f'Title {key}',
+        'enclosure': {
+            'length': '1', 'type': 'audio/mpeg', 'url': f'{key}.mp3',
+        } if enclosure else None,
+        'link': '',
+        'published': datetime(2021, 1, 1),
+        'description': '',
+        'duration': '',
+        'image': '',
+        'author': '',
+        'key': key,
+        'feed_name': 'feed',
+        'source_id': None,
+    }
+
+
+class DatabaseTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_db_engine('sqlite://')
+        migrate(self.engine)
+        session.remove()
+        session.configure(bind=self.engine)
+        session.add(
+            Feed(
+                name='feed', title='', link='', language='',
+                description='', image='',
+            )
+        )
+        session.commit()
+
+    def tearDown(self) -> None:
+        session.remove()
+        session.configure(bind=storage.engine)
+
+
+class InsertEpisodesTestCase(DatabaseTestCase):
+
+    def stored(self):
+        episodes, enclosure = episodes_table.c, enclosure_table.c
+        return session.execute(
+            select(episodes.key, enclosure.url).select_from(
+                episodes_table.outerjoin(
+                    enclosure_table, enclosure.episode_id == episodes.id,
+                )
+            ).order_by(episodes.key)
+        ).all()
+
+    def test__batches(self):
+        statements = []
+        event.listen(
+            self.engine, 'before_cursor_execute',
+            lambda *args: statements.append(args[2]),
+        )
+        insert_episodes([make_episode(str(key)) for key in range(5)], 2)
+        self.assertEqual(3 * 3, len(statements))
+        self.assertEqual(
+            [(str(key), f'{key}.mp3') for key in range(5)], self.stored(),
+        )
+
+    def test__skips_stored_and_missing_enclosure(self):
+        insert_episodes([make_episode('1')])
+        insert_episodes([make_episode('1'), make_episode('2', False)])
+        self.assertEqual([('1', '1.mp3'), ('2', None)], self.stored())
+
+
+class NewEpisodesListTestCase(DatabaseTestCase):
+
+    def new_titles(self, numbers, stored=None):
+        """Titles of the new items and the statements run to find them."""
+        rss = (
+            '<rss><channel><title>Feed</title>' + ''.join(
+                f'<item><title>{number}</title><guid>{number}</guid></item>'
+                for number in numbers
+            ) + '</channel></rss>'
+        ).encode('utf-8')
+        if stored is not None:
+            episode = make_episode('stored')
+            episode['key'] = episode_key({'guid': str(stored)})
+            insert_episodes([episode])
+        feed = session.get(Feed, 'feed')
+        statements = []
+        event.listen(
+            self.engine, 'before_cursor_execute',
+            lambda *args: statements.append(args[2]),
+        )
+        episodes = new_episodes_list(feed, rss)
+        return [episode['title'] for episode in episodes], len(statements)
+
+    def test__stops_at_first_stored(self):
+        self.assertEqual(
+            (['30'], 1), self.new_titles(range(30, 0, -1), stored=29),
+        )
+
+    def test__batches_until_the_end(self):
+        titles, statements = self.new_titles(range(25, 0, -1))
+        self.assertEqual(25, len(titles))
+        # Batches of 10 and 20 items.
+        self.assertEqual(2, statements)
+
+
+class CheckSourceTestCase(DatabaseTestCase):
+
+    def test__parse_error__failed(self):
+        feed = session.get(Feed, 'feed')
+        source = Source('https://e.com/rss')
+        with patch('src.parser.ChannelContext.from_channel', side_effect=(
+                TypeError('decoding str is not supported')
+        )), self.assertLogs('src.updater'):
+            episodes = check_source(
+                feed, source,
+                FetchResult(source.url, content=b'<rss><item/></rss>'),
+                set(),
+            )
+        self.assertIsNone(episodes)
+        self.assertIsNone(source.content_hash)
+
+
+class MergeEpisodesTestCase(TestCase):
+
+    def test__merge_episodes(self):
+        def stream(*hours):
+            return [
+                {
+                    'key': str(hour),
+                    'published': datetime(
+                        2021, 1, 1, hour, tzinfo=timezone(timedelta(hours=3)),
+                    ) if hour is not None else None,
+                } for hour in hours
+            ]
+
+        merged = merge_episodes(
+            [stream(9, 5, 1), stream(8, 4, None), stream(), stream(6, 7)],
+        )
+        self.assertEqual(
+            [episode['key'] for episode in merged],
+            ['None', '1', '4', '5', '6', '7', '8', '9'],
+        )
@@ -0,0 +1,38 @@
+from unittest import skipIf, TestCase
+from unittest.mock import patch
+
+from src.storage import create_db_engine
+from src.thumbnails import Image
+
+# The app migrates its database when imported; keep it in memory.
+with patch('src.storage.engine', create_db_engine('sqlite://')):
+    import main
+
+
+@skipIf(Image is None, 'Pillow is not installed')
+class ThumbnailTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.client = main.app.test_client()
+        # Signed with a key of its own, not one kept on disk.
+        key = patch.object(main.thumbnails, '_key', b'key')
+        key.start()
+        self.addCleanup(key.stop)
+
+    def get(self, source):
+        with patch.object(main.thumbnails, 'get', return_value=None):
+            return self.client.get(
+                '/thumbnail/96',
+                query_string={
+                    'src': source, 'sig': main.thumbnails.sign(source, 96),
+                },
+            )
+
+    def test__thumbnail__not_made__original_image(self):
+        response = self.get('cover art.jpg')
+        self.assertEqual(302, response.status_code)
+        self.assertTrue(
+            response.location.endswith('/image/cover%20art.jpg'),
+        )
+        response = self.get('https://e.com/cover.jpg')
+        self.assertEqual('https://e.com/cover.jpg', response.location)
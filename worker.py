@@ -0,0 +1,86 @@
+import logging
+import signal
+import sys
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, \
+    EVENT_JOB_SUBMITTED, JobSubmissionEvent
+from apscheduler.schedulers.blocking import BlockingScheduler
+
+from src import metrics
+from src.config import load_config, max_items
+from src.fetcher import Fetcher
+from src.lease import Lease
+from src.media_probe import MediaProber
+from src.migrations import migrate
+from src.polling import PollingPolicy
+from src.storage import engine
+from src.updater import BATCH_SIZE, create_feeds, Updater
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s',
+)
+logger = logging.getLogger(__name__)
+scheduler_lag = metrics.registry.histogram(
+    'singlefeed_scheduler_lag_seconds',
+    'Delay between the scheduled and the actual start of updates.',
+)
+scheduler_overlaps = metrics.registry.counter(
+    'singlefeed_scheduler_overlaps_total',
+    'Updates skipped because the previous one was still running.',
+)
+scheduler_missed = metrics.registry.counter(
+    'singlefeed_scheduler_missed_total',
+    'Updates skipped because they were started too late.',
+)
+
+
+def on_submitted(event: JobSubmissionEvent):
+    now = datetime.now(timezone.utc)
+    for run_time in event.scheduled_run_times:
+        scheduler_lag.observe(max(0.0, (now - run_time).total_seconds()))
+
+
+def main():
+    feeds, settings = load_config()
+    migrate(engine)
+    timeout = int(settings['timeout'])
+    lease = Lease(
+        engine, 'updater',
+        timedelta(seconds=int(settings.get('lease_ttl', timeout * 3))),
+    )
+    updater = Updater(
+        create_feeds(feeds, max_items(settings)),
+        Fetcher.from_settings(settings),
+        lease,
+        PollingPolicy.from_settings(settings),
+        int(settings.get('insert_batch_size', BATCH_SIZE)),
+        MediaProber.from_settings(settings),
+        int(settings.get('max_media_probes', 0)),
+    )
+    if 'metrics_port' in settings:
+        metrics.serve(int(settings['metrics_port']))
+    scheduler = BlockingScheduler()
+    scheduler.add_listener(on_submitted, EVENT_JOB_SUBMITTED)
+    scheduler.add_listener(
+        lambda event: scheduler_overlaps.inc(), EVENT_JOB_MAX_INSTANCES,
+    )
+    scheduler.add_listener(
+        lambda event: scheduler_missed.inc(), EVENT_JOB_MISSED,
+    )
+    scheduler.add_job(
+        updater.run, trigger='interval', seconds=timeout,
+        next_run_time=datetime.now(),
+    )
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit())
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        lease.release()
+        logger.info('Worker stopped.')
+
+
+if __name__ == '__main__':
+    main()